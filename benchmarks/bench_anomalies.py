@@ -0,0 +1,45 @@
+import argparse
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from synthetic import make_raw_frame  # noqa: F401  (puts scripts/ on sys.path)
+
+from anomalies import detect_anomalies
+
+def snapshot_batches(videos, snapshots, seed=42):
+    """Yield one batch per snapshot, 6 hours apart, with noisy steady growth per video"""
+    rng = np.random.default_rng(seed)
+    video_ids = np.array([f'vid{i:08d}' for i in range(videos)], dtype=object)
+    views = rng.integers(1_000, 1_000_000, videos)
+    rate = rng.uniform(10, 10_000, videos)
+    for k in range(snapshots):
+        views = views + (rate * 6 * rng.uniform(0.8, 1.2, videos)).astype('int64')
+        extracted_at = (pd.Timestamp('2025-12-25') + pd.Timedelta(hours=6 * k)).strftime('%Y-%m-%d %H:%M:%S')
+        yield pd.DataFrame({
+            'video_id': video_ids,
+            'extracted_at': pd.Categorical([extracted_at] * videos),
+            'view_count': views
+        })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the EWMA anomaly stage per snapshot batch")
+    parser.add_argument('--videos', type=int, default=100_000)
+    parser.add_argument('--snapshots', type=int, default=6)
+    parser.add_argument('--db', default=':memory:', help="SQLite database to write state to")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ANOMALY STAGE BENCHMARK")
+    print("=" * 60)
+    print(f"{'Batch':>6} {'Videos':>10} {'Seconds':>9} {'Flagged':>9}")
+
+    conn = sqlite3.connect(args.db)
+    for k, batch in enumerate(snapshot_batches(args.videos, args.snapshots)):
+        start = time.perf_counter()
+        flagged = detect_anomalies(batch, conn)
+        conn.commit()
+        print(f"{k:>6} {len(batch):>10,} {time.perf_counter() - start:>9.3f} {flagged:>9,}")
+    conn.close()
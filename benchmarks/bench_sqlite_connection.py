@@ -0,0 +1,82 @@
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import time
+
+from synthetic import make_raw_frame
+
+from db import connect
+from load_sqlite import create_database, insert_trending, insert_videos
+from transform import transform_data
+
+QUERIES = [
+    '''SELECT region_code, COUNT(*), AVG(view_count) FROM trending_data GROUP BY region_code''',
+    '''SELECT v.category_id, SUM(t.view_count) FROM trending_data t
+       JOIN videos v ON v.video_id = t.video_id GROUP BY v.category_id''',
+    '''SELECT video_id, MAX(view_count) FROM trending_data GROUP BY video_id
+       ORDER BY 2 DESC LIMIT 20'''
+]
+
+def time_load(df, open_conn, batch_rows):
+    """Return seconds to load df in batch_rows chunks, committing after each"""
+    start = time.perf_counter()
+    conn = open_conn()
+    for offset in range(0, len(df), batch_rows):
+        batch = df.iloc[offset:offset + batch_rows]
+        insert_videos(batch, conn)
+        insert_trending(batch, conn)
+        conn.commit()
+    conn.close()
+    return time.perf_counter() - start
+
+def time_queries(open_conn, repeat):
+    """Return seconds to run QUERIES repeat times, opening a connection per round"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        conn = open_conn()
+        for query in QUERIES:
+            conn.execute(query).fetchall()
+        conn.close()
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare default and tuned SQLite connections")
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--batch-rows', type=int, default=5_000,
+                        help="rows per committed batch, like one refresh of the pipeline")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("SQLITE CONNECTION BENCHMARK")
+    print("=" * 60)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = transform_data(make_raw_frame(args.rows, unique_videos=args.rows // 2), engine='polars')
+    print(f"Transformed rows: {len(df):,} in batches of {args.batch_rows:,}\n")
+    print(f"{'Connection':<12} {'load (s)':>9} {'rows/s':>10} {'queries (s)':>12}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = {}
+        for name in ('default', 'tuned'):
+            db_path = os.path.join(directory, f'{name}.db')
+            with contextlib.redirect_stdout(io.StringIO()):
+                create_database(db_path).close()
+            if name == 'default':
+                # Undo the WAL switch create_database made, back to a rollback journal
+                plain = sqlite3.connect(db_path)
+                plain.execute("PRAGMA journal_mode = DELETE")
+                plain.close()
+                writer, reader = (lambda: sqlite3.connect(db_path)), (lambda: sqlite3.connect(db_path))
+            else:
+                writer, reader = (lambda: connect(db_path)), (lambda: connect(db_path, read_only=True))
+            load_seconds = time_load(df, writer, args.batch_rows)
+            query_seconds = time_queries(reader, args.repeat)
+            results[name] = (load_seconds, query_seconds)
+            print(f"{name:<12} {load_seconds:>9.2f} {len(df) / load_seconds:>10,.0f} {query_seconds:>12.2f}")
+
+    (default_load, default_query), (tuned_load, tuned_query) = results['default'], results['tuned']
+    print(f"\nLoad speedup: {default_load / tuned_load:.2f}x, query speedup: {default_query / tuned_query:.2f}x")
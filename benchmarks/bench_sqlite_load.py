@@ -0,0 +1,90 @@
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from synthetic import make_raw_frame
+
+from load_sqlite import (TRENDING_KEY, VIDEO_COLUMNS, create_database, insert_trending, insert_videos, sqlite_rows,
+                         trending_columns)
+from schema import to_storage
+from transform import transform_data
+
+def load_iterrows(df, conn):
+    """The previous loader: one execute per row (datetimes pre-converted so rows can bind)"""
+    df = to_storage(df).astype({'published_at': str, 'trending_date': str})
+    videos_df = df[VIDEO_COLUMNS].drop_duplicates(subset=['video_id'])
+    cursor = conn.cursor()
+    for _, row in videos_df.iterrows():
+        cursor.execute(f"INSERT OR IGNORE INTO videos ({', '.join(VIDEO_COLUMNS)}) "
+                       f"VALUES ({', '.join('?' * len(VIDEO_COLUMNS))})", tuple(row))
+    columns = trending_columns(df)
+    for _, row in df[columns].iterrows():
+        cursor.execute(f"INSERT OR REPLACE INTO trending_data ({', '.join(columns)}) "
+                       f"VALUES ({', '.join('?' * len(columns))})", tuple(row))
+    conn.commit()
+
+def load_executemany(df, conn):
+    """The previous loader: executemany straight into the indexed tables"""
+    videos_df = df[VIDEO_COLUMNS].drop_duplicates(subset=['video_id'])
+    conn.executemany(f"INSERT OR IGNORE INTO videos ({', '.join(VIDEO_COLUMNS)}) "
+                     f"VALUES ({', '.join('?' * len(VIDEO_COLUMNS))})", sqlite_rows(videos_df))
+    columns = trending_columns(df)
+    updates = ', '.join(f'{column} = excluded.{column}' for column in columns if column not in TRENDING_KEY)
+    conn.executemany(f"INSERT INTO trending_data ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                     f"ON CONFLICT ({', '.join(TRENDING_KEY)}) DO UPDATE SET {updates} "
+                     f"WHERE excluded.extracted_at >= trending_data.extracted_at", sqlite_rows(df[columns]))
+    conn.commit()
+
+def load_staged(df, conn):
+    """The staging-table merge used by main.load_to_sqlite, indexes kept"""
+    insert_videos(df, conn, rebuild_indexes=False)
+    insert_trending(df, conn, rebuild_indexes=False)
+    conn.commit()
+
+def load_staged_rebuild(df, conn):
+    """The staging-table merge with secondary indexes dropped and rebuilt"""
+    insert_videos(df, conn, rebuild_indexes=True)
+    insert_trending(df, conn, rebuild_indexes=True)
+    conn.commit()
+
+def time_loader(loader, df, db_path):
+    """Return seconds to load df into a freshly created database at db_path"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        conn = create_database(db_path)
+    start = time.perf_counter()
+    loader(df, conn)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the iterrows, executemany and staging-table SQLite loaders")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--legacy-rows', type=int, default=50_000,
+                        help="rows loaded with iterrows (its time is extrapolated to --rows)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("SQLITE LOADER BENCHMARK")
+    print("=" * 60)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = transform_data(make_raw_frame(args.rows, unique_videos=args.rows // 2), engine='polars')
+    print(f"Transformed rows: {len(df):,}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy = df.head(args.legacy_rows)
+        legacy_seconds = time_loader(load_iterrows, legacy, os.path.join(directory, 'iterrows.db'))
+        timings = [(name, time_loader(loader, df, os.path.join(directory, f'{name}.db')))
+                   for name, loader in [('executemany', load_executemany), ('staged', load_staged),
+                                        ('staged+rebuild', load_staged_rebuild)]]
+
+    legacy_rate = len(legacy) / legacy_seconds
+    print(f"{'iterrows':<15} {len(legacy):>10,} rows in {legacy_seconds:7.2f}s ({legacy_rate:>10,.0f} rows/s)")
+    for name, seconds in timings:
+        print(f"{name:<15} {len(df):>10,} rows in {seconds:7.2f}s ({len(df) / seconds:>10,.0f} rows/s, "
+              f"{len(df) / seconds / legacy_rate:.1f}x iterrows)")
+    print(f"(iterrows would take ~{len(df) / legacy_rate:.0f}s for {len(df):,} rows)")
@@ -0,0 +1,103 @@
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from synthetic import make_raw_frame
+
+import db
+from db import connect
+from load_sqlite import create_database, write_batch
+from transform import transform_data
+from writer import SQLiteWriter
+
+def producer_batches(producers, batches, batch_rows):
+    """Return one list of transformed batches per producer, each producer with its own videos"""
+    rows = batches * batch_rows
+    with contextlib.redirect_stdout(io.StringIO()):
+        frames = [transform_data(make_raw_frame(rows, seed=seed, unique_videos=rows // 2), engine='polars')
+                  for seed in range(producers)]
+    for seed, df in enumerate(frames):
+        df['video_id'] = f'p{seed}_' + df['video_id'].astype(str)
+    return [[df.iloc[offset:offset + batch_rows] for offset in range(0, len(df), batch_rows)] for df in frames]
+
+def load_direct(db_path, batches, stats):
+    """One producer writing its own batches, a connection per batch as load_to_sqlite does"""
+    for df in batches:
+        start = time.perf_counter()
+        conn = connect(db_path)
+        try:
+            write_batch(df, conn)
+            conn.commit()
+            stats['ok'] += 1
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            stats['locked' if 'locked' in str(e) else 'failed'] += 1
+        finally:
+            conn.close()
+        stats['latency'].append(time.perf_counter() - start)
+
+def load_queued(writer, batches, stats):
+    """One producer submitting its batches to the shared writer and waiting for each ack"""
+    for df in batches:
+        start = time.perf_counter()
+        try:
+            writer.submit(df).result()
+            stats['ok'] += 1
+        except sqlite3.OperationalError as e:
+            stats['locked' if 'locked' in str(e) else 'failed'] += 1
+        stats['latency'].append(time.perf_counter() - start)
+
+def run(target, args_for, producers):
+    """Run target in one thread per producer; returns (seconds, merged stats)"""
+    stats = [{'ok': 0, 'locked': 0, 'failed': 0, 'latency': []} for _ in range(producers)]
+    threads = [threading.Thread(target=target, args=args_for(number, stats[number])) for number in range(producers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    merged = {key: sum(s[key] for s in stats) for key in ('ok', 'locked', 'failed')}
+    latency = sorted(value for s in stats for value in s['latency'])
+    merged['p95'] = latency[int(len(latency) * 0.95) - 1] if latency else 0.0
+    return seconds, merged
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare concurrent direct loads with the single SQLite writer")
+    parser.add_argument('--producers', type=int, default=8, help="concurrent pipelines, like one per region")
+    parser.add_argument('--batches', type=int, default=5, help="batches per producer")
+    parser.add_argument('--batch-rows', type=int, default=1_000)
+    parser.add_argument('--busy-timeout-ms', type=int, default=db.BUSY_TIMEOUT_MS,
+                        help="how long a direct writer waits for the lock before 'database is locked'")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("SQLITE WRITER BENCHMARK")
+    print("=" * 60)
+
+    work = producer_batches(args.producers, args.batches, args.batch_rows)
+    total = sum(len(df) for batches in work for df in batches)
+    print(f"{args.producers} producers x {args.batches} batches of {args.batch_rows:,} rows "
+          f"({total:,} rows), busy timeout {args.busy_timeout_ms} ms\n")
+    print(f"{'Mode':<10} {'time (s)':>9} {'rows/s':>9} {'ok':>5} {'locked':>7} {'p95 ack (s)':>12} {'commits':>8}")
+
+    db.BUSY_TIMEOUT_MS = args.busy_timeout_ms
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ('direct', 'writer'):
+            db_path = os.path.join(directory, f'{mode}.db')
+            with contextlib.redirect_stdout(io.StringIO()):
+                create_database(db_path).close()
+            if mode == 'direct':
+                seconds, stats = run(load_direct, lambda n, s: (db_path, work[n], s), args.producers)
+                commits = stats['ok']
+            else:
+                with SQLiteWriter(db_path) as writer:
+                    seconds, stats = run(load_queued, lambda n, s: (writer, work[n], s), args.producers)
+                commits = writer.commits
+            print(f"{mode:<10} {seconds:>9.2f} {total / seconds:>9,.0f} {stats['ok']:>5} "
+                  f"{stats['locked'] + stats['failed']:>7} {stats['p95']:>12.2f} {commits:>8}")
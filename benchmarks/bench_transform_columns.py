@@ -0,0 +1,39 @@
+import argparse
+import contextlib
+import io
+import time
+
+from synthetic import make_raw_frame
+
+from transform import transform_data, plan_producers
+
+# What the snapshot/rank loaders read from a refresh batch
+NARROW_COLUMNS = ['video_id', 'trending_date', 'region_code', 'extracted_at',
+                  'view_count', 'like_count', 'comment_count', 'like_rate', 'comment_rate']
+
+def time_transform(df, engine, columns):
+    """Return seconds for one transform run, with step output silenced"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        transform_data(df, engine=engine, columns=columns)
+        return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare full and column-limited transforms")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000])
+    parser.add_argument('--engine', choices=['pandas', 'polars'], default='pandas')
+    parser.add_argument('--columns', nargs='+', default=NARROW_COLUMNS)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("COLUMN-LIMITED TRANSFORM BENCHMARK")
+    print("=" * 60)
+    print(f"Columns: {', '.join(args.columns)}")
+    print(f"Producers run: {', '.join(plan_producers(args.columns))}\n")
+    print(f"{'Rows':>12} {'all (s)':>10} {'narrow (s)':>11} {'Speedup':>9}")
+
+    for rows in args.rows:
+        df = make_raw_frame(rows, unique_videos=rows // 2)
+        full_seconds = time_transform(df, args.engine, None)
+        narrow_seconds = time_transform(df, args.engine, args.columns)
+        print(f"{rows:>12,} {full_seconds:>10.2f} {narrow_seconds:>11.2f} {full_seconds / narrow_seconds:>8.1f}x")
@@ -0,0 +1,39 @@
+import argparse
+import contextlib
+import io
+import time
+
+from synthetic import make_raw_frame
+
+from transform import transform_data
+from transform_polars import assert_engines_match
+
+def time_engine(df, engine):
+    """Return (seconds, result) for one transform run, with step output silenced"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = transform_data(df, engine=engine)
+        elapsed = time.perf_counter() - start
+    return elapsed, result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the pandas and polars transform engines")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--no-check', action='store_true', help="skip the column-for-column parity check")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("TRANSFORM ENGINE BENCHMARK")
+    print("=" * 60)
+    print(f"{'Rows':>12} {'pandas (s)':>12} {'polars (s)':>12} {'Speedup':>9}")
+
+    for rows in args.rows:
+        df = make_raw_frame(rows, unique_videos=rows // 2)
+        pandas_seconds, pandas_result = time_engine(df, 'pandas')
+        polars_seconds, polars_result = time_engine(df, 'polars')
+        if not args.no_check:
+            assert_engines_match(pandas_result, polars_result)
+        print(f"{rows:>12,} {pandas_seconds:>12.2f} {polars_seconds:>12.2f} {pandas_seconds / polars_seconds:>8.1f}x")
+
+    if not args.no_check:
+        print("\n✓ Both engines produced identical output")
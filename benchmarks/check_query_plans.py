@@ -0,0 +1,210 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+from synthetic import CATEGORIES, REGIONS, project_dir
+
+from db import connect
+from load_sqlite import create_database
+from shards import attach_shards
+
+DASHBOARD_PATH = os.path.join(project_dir, 'dashboard', 'simple_dashboard.py')
+ANALYSIS_PATH = os.path.join(project_dir, 'sql', 'analysis_queries.sql')
+
+# Tables whose rows grow with every refresh; a plain SCAN of one is a regression
+LARGE_TABLES = {'trending_data', 'chart_ranks', 'videos', 'video_region_presence'}
+
+# Queries that aggregate every snapshot, so reading the whole table is the point
+FULL_SCAN_ALLOWED = {
+    'analysis 4. Video Duration vs Engagement': {'videos'},
+    'analysis 5. Time to Trend Analysis': {'trending_data'},
+    'analysis 6. Engagement Metrics Summary': {'trending_data'},
+    'analysis 16. Region Overlap: Jaccard Similarity of the Video-Days Trending in Each Region Pair':
+        {'video_region_presence'},
+    'dashboard 4': {'videos'}
+}
+
+SQL_KEYWORDS = {'on', 'where', 'join', 'left', 'cross', 'inner', 'group', 'order', 'limit', 'having', 'using'}
+
+def dashboard_queries():
+    """Return (name, sql) for every query in the dashboard"""
+    with open(DASHBOARD_PATH, encoding='utf-8') as f:
+        source = f.read()
+    return [(f'dashboard {number}', query)
+            for number, query in enumerate(re.findall(r'query = """(.*?)"""', source, re.S), start=1)]
+
+def analysis_queries():
+    """Return (name, sql) for every query in sql/analysis_queries.sql, named by its comment"""
+    with open(ANALYSIS_PATH, encoding='utf-8') as f:
+        source = f.read()
+    queries = []
+    for block in source.split(';'):
+        titles = re.findall(r'^-- (\d+\..*?)(?: \(.*)?$', block, re.M)
+        sql = re.sub(r'^--.*$', '', block, flags=re.M).strip()
+        if titles and sql:
+            queries.append((f'analysis {titles[-1].strip()}', sql))
+    return queries
+
+def table_aliases(sql):
+    """Map every alias (and bare table name) in the FROM/JOIN clauses of sql to its table"""
+    aliases = {}
+    for table, alias in re.findall(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', sql, re.I):
+        aliases[table] = table
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+def filtered(sql, alias):
+    """Return True if a WHERE clause of sql tests a column of alias"""
+    return re.search(rf'\bWHERE\b.*\b{alias}\.\w+', sql, re.I | re.S) is not None
+
+def full_scans(conn, sql):
+    """Return (tables, plan): the tables that EXPLAIN QUERY PLAN reads without an index, and the plan
+
+    An index walked only for its order (SCAN ... USING INDEX) is a bounded
+    top-N read, unless a WHERE clause filters the rows: then nothing stops
+    the walk before the end of the table.
+    """
+    plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}')]
+    aliases = table_aliases(sql)
+    scans = []
+    for detail in plan:
+        # Shards behind the trending_data view show up schema-qualified
+        match = re.fullmatch(r'SCAN (?:\w+\.)?(\w+)( USING INDEX \w+)?', detail)
+        if match and (not match.group(2) or filtered(sql, match.group(1))):
+            scans.append(aliases.get(match.group(1), match.group(1)))
+    return scans, plan
+
+def populate(conn, rows, snapshots_per_video):
+    """Fill trending_data with rows synthetic snapshots and derive the tables queried alongside it"""
+    videos = max(rows // snapshots_per_video, 1)
+    regions = json.dumps(REGIONS)
+    categories = json.dumps([int(category) for category in CATEGORIES])
+    conn.executescript(f'''
+        INSERT INTO videos (video_id, title, channel_id, channel_name, category_id,
+                            published_at, duration_minutes, tags)
+        WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < {videos - 1})
+        SELECT printf('v%010d', i), 'Video ' || i, printf('c%07d', i % 50000),
+               'Channel ' || (i % 50000),
+               json_extract('{categories}', '$[' || (i % {len(CATEGORIES)}) || ']'),
+               '2025-11-20 00:00:00+00:00', (i % 240) / 4.0, 'netflix,trailer'
+        FROM n;
+
+        INSERT INTO trending_data (video_id, trending_date, region_code, view_count, like_count,
+                                   comment_count, engagement_rate, like_rate, comment_rate,
+                                   days_to_trend, extracted_at)
+        WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < {rows - 1})
+        SELECT printf('v%010d', i % {videos}),
+               date('2025-12-01', '+' || ((i / {videos}) % 30) || ' days') || ' 00:00:00+00:00',
+               json_extract('{regions}', '$[' || ((i / {videos * 30}) % {len(REGIONS)}) || ']'),
+               abs(random()) % 50000000, abs(random()) % 1000000, abs(random()) % 100000,
+               (abs(random()) % 1000) / 100.0, (abs(random()) % 500) / 100.0, (abs(random()) % 100) / 100.0,
+               abs(random()) % 14, date('2025-12-01', '+' || ((i / {videos}) % 30) || ' days') || ' 06:00:00+00:00'
+        FROM n;
+
+        INSERT INTO chart_ranks (region_code, snapshot_at, chart_rank, video_id, view_count, prev_rank, rank_delta)
+        SELECT region_code, extracted_at,
+               ROW_NUMBER() OVER (PARTITION BY region_code, extracted_at ORDER BY view_count DESC),
+               video_id, view_count, NULL, NULL
+        FROM trending_data WHERE id % 10 = 0;
+
+        INSERT INTO trending_streaks (video_id, region_code, streak_start, last_seen, days)
+        SELECT video_id, region_code, substr(MIN(trending_date), 1, 10), substr(MAX(trending_date), 1, 10), COUNT(*)
+        FROM trending_data GROUP BY video_id, region_code;
+
+        INSERT INTO anomalies (video_id, detected_at, kind, views_per_hour, expected_per_hour, z_score)
+        SELECT video_id, substr(extracted_at, 1, 19), 'spike', view_count / 24.0, view_count / 96.0, 4.0
+        FROM trending_data WHERE id % 100 = 0;
+
+        INSERT INTO trending_daily (video_id, region_code, trending_date, snapshots, first_seen, last_seen,
+                                    min_views, max_views, last_views, peak_rank)
+        SELECT video_id, region_code, date(substr(snapshot_at, 1, 10), '-60 days'), 1, snapshot_at, snapshot_at,
+               view_count, view_count, view_count, chart_rank
+        FROM chart_ranks WHERE chart_rank <= 10;
+
+        INSERT INTO videos_history (video_id, valid_from, valid_to, title, channel_id, channel_name,
+                                    category_id, published_at, duration_minutes, tags, content_hash)
+        SELECT video_id, '2025-11-20 00:00:00+00:00', NULL, title, channel_id, channel_name,
+               category_id, published_at, duration_minutes, tags, printf('%040d', rowid)
+        FROM videos;
+        INSERT INTO videos_history (video_id, valid_from, valid_to, title, channel_id, channel_name,
+                                    category_id, published_at, duration_minutes, tags, content_hash)
+        SELECT video_id, '2025-11-10 00:00:00+00:00', '2025-11-20 00:00:00+00:00', 'Old ' || title, channel_id,
+               channel_name, category_id, published_at, duration_minutes, tags, printf('%040d', -rowid)
+        FROM videos WHERE rowid % 20 = 0;
+
+        INSERT INTO regions (region_code, bit) SELECT value, key FROM json_each('{regions}');
+        INSERT INTO video_region_presence (video_id, trending_date, region_mask, region_count)
+        SELECT t.video_id, substr(t.trending_date, 1, 10), SUM(DISTINCT 1 << r.bit), COUNT(DISTINCT t.region_code)
+        FROM trending_data t JOIN regions r ON r.region_code = t.region_code
+        GROUP BY t.video_id, substr(t.trending_date, 1, 10);
+        -- Every tenth video also trends in a second region
+        UPDATE video_region_presence SET region_mask = region_mask | 2, region_count = region_count + 1
+        WHERE video_id LIKE '%7' AND region_mask & 2 = 0;
+    ''')
+    conn.commit()
+
+def build_database(db_path, rows, snapshots_per_video):
+    """Create a database at db_path, fill it with populate() and analyze it"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_database(db_path).close()
+    conn = connect(db_path)
+    populate(conn, rows, snapshots_per_video)
+    # Plans are chosen from the same statistics the loader keeps current
+    conn.execute("ANALYZE")
+    conn.close()
+
+def plan_regressions(conn, name, sql):
+    """Return (tables, plan): the large tables query name scans without being allowed to, and its plan"""
+    scans, plan = full_scans(conn, sql)
+    return [table for table in scans
+            if table in LARGE_TABLES and table not in FULL_SCAN_ALLOWED.get(name, set())], plan
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if a dashboard or analysis query plans a full table scan")
+    parser.add_argument('--rows', type=int, default=10_000_000, help="synthetic trending_data rows")
+    parser.add_argument('--snapshots-per-video', type=int, default=20)
+    parser.add_argument('--db', help="check an existing database instead of building a synthetic one")
+    parser.add_argument('--since', default=os.getenv('DASHBOARD_SINCE'),
+                        help="also read the shards archived since this date, as the dashboard does with DASHBOARD_SINCE")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("QUERY PLAN CHECK")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = args.db or os.path.join(directory, 'plans.db')
+        if not args.db:
+            start = time.perf_counter()
+            build_database(db_path, args.rows, args.snapshots_per_video)
+            print(f"Built {args.rows:,}-row synthetic database in {time.perf_counter() - start:.1f}s\n")
+
+        conn = connect(db_path, read_only=True)
+        if args.since:
+            attach_shards(conn, start=args.since)
+        failures = 0
+        for name, sql in dashboard_queries() + analysis_queries():
+            try:
+                regressions, plan = plan_regressions(conn, name, sql)
+            except sqlite3.OperationalError as e:
+                # --db may point at a database created before some tables existed
+                print(f"[skip] {name} ({e})")
+                continue
+            status = 'FAIL' if regressions else 'ok'
+            print(f"[{status:>4}] {name}")
+            if regressions:
+                failures += 1
+                for detail in plan:
+                    print(f"         {detail}")
+        conn.close()
+
+    print(f"\n{failures} queries scan a large table without an index")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,60 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Make the pipeline modules importable when run as a script
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_dir, 'scripts'))
+
+from schema import RAW_SCHEMA, apply_schema
+
+REGIONS = ['US', 'GB', 'IN', 'CA', 'DE', 'FR', 'JP', 'KR', 'BR', 'MX']
+CATEGORIES = ['1', '2', '10', '15', '17', '20', '22', '23', '24', '25', '26', '27', '28']
+WORDS = ['Official', 'Video', 'Trailer', 'Live', 'Highlights', 'Music', 'Reaction', 'Review',
+         'Netflix', 'Christmas', 'Gaming', 'Full', 'Episode', 'Best', 'Top', '2026', 'New',
+         'Teaser', 'Podcast', 'Challenge', 'Über', 'Canción', '🎄', '❄️', '|', '#shorts']
+
+def make_raw_frame(rows, seed=42, unique_videos=None):
+    """Build a synthetic raw extract with the same columns and formats as extract.py"""
+    rng = np.random.default_rng(seed)
+    unique_videos = unique_videos or rows
+    video_numbers = rng.integers(0, unique_videos, rows)
+    video_ids = pd.Series(video_numbers).map('v{:010d}'.format)
+
+    words = np.array(WORDS, dtype=object)
+    title_words = words[rng.integers(0, len(words), (rows, 6))]
+    titles = pd.Series([' '.join(w) for w in title_words])
+
+    hours = rng.integers(0, 4, rows)
+    minutes = rng.integers(0, 60, rows)
+    seconds = rng.integers(0, 60, rows)
+    durations = pd.Series([
+        'PT' + (f'{h}H' if h else '') + (f'{m}M' if m else '') + (f'{s}S' if s else '')
+        for h, m, s in zip(hours, minutes, seconds)
+    ])
+
+    trending_days = rng.integers(0, 30, rows)
+    trending_dates = (pd.Timestamp('2025-12-01') + pd.to_timedelta(trending_days, unit='D')).strftime('%Y-%m-%d')
+    published = (pd.Timestamp('2025-11-20') + pd.to_timedelta(trending_days, unit='D')
+                 + pd.to_timedelta(rng.integers(0, 14 * 86400, rows), unit='s'))
+
+    views = rng.integers(0, 50_000_000, rows)
+    df = pd.DataFrame({
+        'video_id': video_ids,
+        'title': titles,
+        'channel_name': pd.Series(video_numbers % 5000).map('Channel {}'.format),
+        'channel_id': pd.Series(video_numbers % 5000).map('UC{:022d}'.format),
+        'published_at': published.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'category_id': np.array(CATEGORIES)[rng.integers(0, len(CATEGORIES), rows)],
+        'tags': pd.Series(title_words[:, :4].tolist()).str.join(','),
+        'view_count': views,
+        'like_count': (views * rng.random(rows) * 0.05).astype('int64'),
+        'comment_count': (views * rng.random(rows) * 0.005).astype('int64'),
+        'duration': durations,
+        'region_code': np.array(REGIONS)[rng.integers(0, len(REGIONS), rows)],
+        'trending_date': trending_dates,
+        'extracted_at': [d + ' 11:06:31' for d in trending_dates]
+    })
+    return apply_schema(df, RAW_SCHEMA)
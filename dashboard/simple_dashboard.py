@@ -1,10 +1,24 @@
-import sqlite3
 import pandas as pd
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from db import connect, get_db_path
+from shards import attach_shards
+
+# trending_data holds the open months of the main database (SHARD_OPEN_MONTHS)
+# unless DASHBOARD_SINCE ('YYYY-MM-DD') also reads the archived months since then
+DASHBOARD_SINCE = os.getenv('DASHBOARD_SINCE')
 
 def run_query(query, db_path):
-    """Execute SQL query and return DataFrame"""
-    conn = sqlite3.connect(db_path)
+    """Execute SQL query and return DataFrame
+
+    With DASHBOARD_SINCE, trending_data is the view over main and the
+    attached shards, which the queries scan instead of seeking.
+    """
+    conn = connect(db_path, read_only=True)
+    if DASHBOARD_SINCE:
+        attach_shards(conn, start=DASHBOARD_SINCE)
     df = pd.read_sql_query(query, conn)
     conn.close()
     return df
@@ -13,9 +27,7 @@ def display_dashboard():
     """Display simple text-based dashboard"""
     
     # Get database path
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_dir = os.path.dirname(script_dir)
-    db_path = os.path.join(project_dir, 'youtube_analytics.db')
+    db_path = get_db_path()
     
     if not os.path.exists(db_path):
         print("❌ Database not found. Run main.py first!")
@@ -60,10 +72,14 @@ def display_dashboard():
             v.channel_name,
             t.view_count,
             t.engagement_rate
-        FROM videos v
-        JOIN trending_data t ON v.video_id = t.video_id
+        FROM (
+            SELECT video_id, view_count, engagement_rate
+            FROM trending_data
+            ORDER BY view_count DESC
+            LIMIT 10
+        ) t
+        JOIN videos v ON v.video_id = t.video_id
         ORDER BY t.view_count DESC
-        LIMIT 10
     """
     df = run_query(query, db_path)
     
@@ -0,0 +1,165 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from velocity import _timestamps
+
+ALPHA = float(os.getenv('ANOMALY_ALPHA', 0.3))          # EWMA weight of the newest growth rate
+Z_THRESHOLD = float(os.getenv('ANOMALY_Z', 3.0))        # deviations from the EWMA that count as anomalous
+MIN_SAMPLES = int(os.getenv('ANOMALY_MIN_SAMPLES', 3))  # growth rates seen before a video can be flagged
+STD_FLOOR = float(os.getenv('ANOMALY_STD_FLOOR', 0.1))  # minimum deviation as a share of the mean rate
+
+STATE_COLUMNS = ['video_id', 'last_at', 'last_views', 'ewma_mean', 'ewma_var', 'samples']
+
+# One row of running state per video, so a batch never rescans history;
+# last_at is in epoch seconds
+ANOMALY_TABLES = [
+    '''CREATE TABLE IF NOT EXISTS view_growth_state (
+        video_id TEXT PRIMARY KEY,
+        last_at INTEGER NOT NULL,
+        last_views INTEGER NOT NULL,
+        ewma_mean REAL,
+        ewma_var REAL,
+        samples INTEGER NOT NULL
+    ) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS anomalies (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        video_id TEXT NOT NULL,
+        detected_at TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        views_per_hour REAL NOT NULL,
+        expected_per_hour REAL NOT NULL,
+        z_score REAL NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_anomalies_detected ON anomalies (detected_at)',
+    'CREATE INDEX IF NOT EXISTS idx_anomalies_video ON anomalies (video_id)'
+]
+
+def fetch_state(video_ids, conn):
+    """Return the stored growth state of video_ids as aligned numpy arrays
+
+    Videos without state get NaT/NaN and zero samples.
+    """
+    # One JSON parameter instead of a temp table keeps the lookup a single statement
+    rows = conn.execute(f'''
+        SELECT {', '.join('s.' + column for column in STATE_COLUMNS)}
+        FROM json_each(?) j JOIN view_growth_state s ON s.video_id = j.value
+    ''', (json.dumps(video_ids.tolist()),)).fetchall()
+
+    state = {
+        'last_at': np.full(len(video_ids), np.datetime64('NaT'), dtype='datetime64[us]'),
+        'last_views': np.full(len(video_ids), np.nan),
+        'ewma_mean': np.full(len(video_ids), np.nan),
+        'ewma_var': np.full(len(video_ids), np.nan),
+        'samples': np.zeros(len(video_ids), dtype='int64')
+    }
+    if rows:
+        stored_ids, last_at, last_views, ewma_mean, ewma_var, samples = zip(*rows)
+        found = pd.Index(video_ids).get_indexer(np.array(stored_ids, dtype=object))
+        state['last_at'][found] = np.array(last_at, dtype='int64').astype('datetime64[s]')
+        state['last_views'][found] = np.array(last_views, dtype='float64')
+        state['ewma_mean'][found] = np.array(ewma_mean, dtype='float64')
+        state['ewma_var'][found] = np.array(ewma_var, dtype='float64')
+        state['samples'][found] = np.array(samples, dtype='int64')
+    return state
+
+def update_ewma(state, at, views):
+    """Apply one snapshot per video to state arrays in place; returns (rate, expected, z) arrays
+
+    state holds aligned numpy arrays. Rates are views per hour since the
+    previous snapshot; z is NaN until a video has MIN_SAMPLES rates. The
+    deviation used for z is at least STD_FLOOR times the mean rate.
+    """
+    has_previous = ~np.isnat(state['last_at'])
+    hours = (at - state['last_at']) / np.timedelta64(1, 'h')
+    valid = has_previous & (hours > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(valid, (views - state['last_views']) / hours, np.nan)
+
+        # The floor keeps near-constant growth from flagging every small wobble
+        expected = state['ewma_mean'].copy()
+        std = np.maximum(np.sqrt(state['ewma_var']), STD_FLOOR * np.abs(expected))
+        z = np.where(valid & (state['samples'] >= MIN_SAMPLES) & (std > 0), (rate - expected) / std, np.nan)
+
+        # First rate seeds the mean; later ones use the exponentially weighted update
+        first = valid & np.isnan(state['ewma_mean'])
+        diff = rate - state['ewma_mean']
+        update = valid & ~first
+        state['ewma_mean'] = np.where(first, rate, np.where(update, state['ewma_mean'] + ALPHA * diff,
+                                                            state['ewma_mean']))
+        state['ewma_var'] = np.where(first, 0.0, np.where(update, (1 - ALPHA) * (state['ewma_var'] + ALPHA * diff ** 2),
+                                                          state['ewma_var']))
+    state['samples'] = state['samples'] + valid
+    state['last_at'] = np.where(valid | ~has_previous, at, state['last_at'])
+    state['last_views'] = np.where(valid | ~has_previous, views, state['last_views'])
+    return rate, expected, z
+
+def detect_anomalies(df, conn):
+    """Update the growth state from the snapshots in df and record spikes and stalls
+
+    Returns the number of anomalies written. A snapshot is a spike (stall)
+    when its views per hour are more than Z_THRESHOLD EWMA standard
+    deviations above (below) the video's running mean. The caller commits.
+    """
+    for statement in ANOMALY_TABLES:
+        conn.execute(statement)
+
+    # Views are global, so a video seen in several regions at once is one snapshot
+    codes, video_ids = pd.factorize(df['video_id'].astype(str).to_numpy(dtype=object))
+    at = _timestamps(df['extracted_at'])
+    views = df['view_count'].to_numpy(dtype='float64')
+    keep = ~np.isnat(at) & ~np.isnan(views) & (codes >= 0)
+    order = np.lexsort((at[keep], codes[keep]))
+    codes, at, views = codes[keep][order], at[keep][order], views[keep][order]
+    if len(codes) == 0:
+        return 0
+    fresh = np.r_[True, (codes[1:] != codes[:-1]) | (at[1:] != at[:-1])]
+    codes, at, views = codes[fresh], at[fresh], views[fresh]
+
+    video_ids = np.asarray(video_ids, dtype=object)
+    state = fetch_state(video_ids, conn)
+
+    # Usually one snapshot per video; older backlog batches are applied in rounds
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    round_number = np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+    events = []
+    for k in range(round_number.max() + 1):
+        in_round = round_number == k
+        rows = codes[in_round]
+        round_state = {column: values[rows] for column, values in state.items()}
+        rate, expected, z = update_ewma(round_state, at[in_round], views[in_round])
+        for column, values in round_state.items():
+            state[column][rows] = values
+
+        flagged = np.abs(np.nan_to_num(z)) > Z_THRESHOLD
+        events.append(pd.DataFrame({
+            'video_id': video_ids[rows[flagged]],
+            'detected_at': pd.DatetimeIndex(at[in_round][flagged]).strftime('%Y-%m-%d %H:%M:%S'),
+            'kind': np.where(z[flagged] > 0, 'spike', 'stall'),
+            'views_per_hour': rate[flagged],
+            'expected_per_hour': expected[flagged],
+            'z_score': z[flagged]
+        }))
+
+    # Only videos seen in this batch are written; NaN binds as NULL
+    seen = np.unique(codes)
+    conn.executemany(f'''
+        INSERT OR REPLACE INTO view_growth_state ({', '.join(STATE_COLUMNS)})
+        VALUES ({', '.join('?' * len(STATE_COLUMNS))})
+    ''', zip(
+        video_ids[seen].tolist(),
+        state['last_at'][seen].astype('datetime64[s]').astype('int64').tolist(),
+        state['last_views'][seen].astype('int64').tolist(),
+        state['ewma_mean'][seen].tolist(),
+        state['ewma_var'][seen].tolist(),
+        state['samples'][seen].tolist()
+    ))
+
+    anomalies = pd.concat(events, ignore_index=True)
+    conn.executemany('''
+        INSERT INTO anomalies (video_id, detected_at, kind, views_per_hour, expected_per_hour, z_score)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', anomalies.astype(object).itertuples(index=False, name=None))
+    return len(anomalies)
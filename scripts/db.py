@@ -0,0 +1,41 @@
+import os
+import sqlite3
+from pathlib import Path
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(script_dir)
+
+DEFAULT_DB_PATH = os.path.join(project_dir, 'youtube_analytics.db')
+
+CACHE_MB = int(os.getenv('SQLITE_CACHE_MB', 64))            # page cache per connection
+MMAP_MB = int(os.getenv('SQLITE_MMAP_MB', 256))             # memory-mapped read window
+BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+
+def get_db_path():
+    """Return the path of the SQLite database"""
+    return os.getenv('YOUTUBE_DB_PATH', DEFAULT_DB_PATH)
+
+def read_only_uri(path):
+    """Return a mode=ro URI for path, with '#', '?' and '%' in it percent-encoded"""
+    return f'{Path(path).resolve().as_uri()}?mode=ro'
+
+def connect(db_path=None, read_only=False):
+    """Open the pipeline database with tuned pragmas
+
+    Writers switch the file to WAL with synchronous=NORMAL, so commits do not
+    fsync and readers are never blocked by a load. read_only=True opens the
+    file with mode=ro for dashboards and ad-hoc queries.
+    """
+    db_path = db_path or get_db_path()
+    if read_only:
+        conn = sqlite3.connect(read_only_uri(db_path), uri=True, timeout=BUSY_TIMEOUT_MS / 1000)
+    else:
+        # uri=True only affects 'file:' names, so shards.py can ATTACH read-only URIs
+        conn = sqlite3.connect(db_path, uri=True, timeout=BUSY_TIMEOUT_MS / 1000)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_MB * 1024}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_MB * 1024 * 1024}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    return conn
@@ -5,6 +5,8 @@ from datetime import datetime
 from dotenv import load_dotenv
 from pathlib import Path
 
+from schema import RAW_SCHEMA, apply_schema
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -35,7 +37,8 @@ def fetch_trending_videos(region_code='US', max_results=50):
         
         videos_data = []
         
-        for item in response['items']:
+        # Items come back in chart order, so the position is the chart rank
+        for rank, item in enumerate(response['items'], start=1):
             video_data = {
                 'video_id': item['id'],
                 'title': item['snippet']['title'],
@@ -49,13 +52,14 @@ def fetch_trending_videos(region_code='US', max_results=50):
                 'comment_count': int(item['statistics'].get('commentCount', 0)),
                 'duration': item['contentDetails']['duration'],
                 'region_code': region_code,
+                'chart_rank': rank,
                 'trending_date': datetime.now().strftime('%Y-%m-%d'),
                 'extracted_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
             videos_data.append(video_data)
         
         df = pd.DataFrame(videos_data)
-        return df
+        return apply_schema(df, RAW_SCHEMA)
     
     except Exception as e:
         print(f"❌ Error fetching videos: {str(e)}")
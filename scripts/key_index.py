@@ -0,0 +1,183 @@
+import argparse
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from db import connect
+from shards import archived_months, each_month_schema
+from transform import to_utc
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(script_dir)
+
+DEFAULT_INDEX_PATH = os.path.join(project_dir, 'data', 'cache', 'loaded_keys.npz')
+DEFAULT_CAPACITY = 1_000_000
+DEFAULT_FP_RATE = 0.001
+
+# A snapshot is identified by its extracted_at as well, so later snapshots of
+# the same day are not mistaken for loaded ones
+KEY_COLUMNS = ['video_id', 'trending_date', 'region_code', 'extracted_at']
+
+# Two independent 16-byte hash keys give the double-hashing pair h1 + i * h2
+_HASH_KEYS = ('loaded-keys-h1-0', 'loaded-keys-h2-0')
+
+def snapshot_keys(df):
+    """Return the KEY_COLUMNS key of every row, with the date as YYYY-MM-DD and extracted_at as stored"""
+    return pd.DataFrame({
+        'video_id': df['video_id'].astype(str).to_numpy(),
+        'trending_date': to_utc(df['trending_date']).dt.strftime('%Y-%m-%d').to_numpy(dtype=object),
+        'region_code': df['region_code'].astype(str).to_numpy(),
+        'extracted_at': df['extracted_at'].astype(str).to_numpy(dtype=object)
+    }, index=df.index)
+
+class LoadedKeyFilter:
+    """Persistent Bloom filter of the snapshot keys already loaded into trending_data
+
+    A negative answer is exact; a positive one is wrong at roughly fp_rate
+    while no more than capacity keys have been added.
+    """
+
+    def __init__(self, path=None, capacity=None, fp_rate=None):
+        self.path = path or os.getenv('LOADED_KEYS_PATH', DEFAULT_INDEX_PATH)
+        self.capacity = capacity or int(os.getenv('BLOOM_CAPACITY', DEFAULT_CAPACITY))
+        self.fp_rate = fp_rate or float(os.getenv('BLOOM_FP_RATE', DEFAULT_FP_RATE))
+        self.num_bits = max(64, math.ceil(-self.capacity * math.log(self.fp_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    @classmethod
+    def load(cls, path=None):
+        """Load the filter from disk, starting empty if the file does not exist"""
+        key_filter = cls(path)
+        if os.path.exists(key_filter.path):
+            with np.load(key_filter.path) as stored:
+                capacity, count = (int(value) for value in stored['params'])
+                key_filter = cls(key_filter.path, capacity, float(stored['fp_rate']))
+                key_filter.bits = stored['bits']
+                key_filter.count = count
+        return key_filter
+
+    def save(self):
+        """Write the filter to disk atomically"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp.npz'
+        np.savez(tmp_path, bits=self.bits, params=np.array([self.capacity, self.count]),
+                 fp_rate=np.array(self.fp_rate))
+        os.replace(tmp_path, self.path)
+
+    @property
+    def saturated(self):
+        return self.count > self.capacity
+
+    def _positions(self, keys):
+        """Return an (n, num_hashes) array of bit positions for a key frame"""
+        h1, h2 = (pd.util.hash_pandas_object(keys, index=False, hash_key=hash_key, categorize=False)
+                  .to_numpy() for hash_key in _HASH_KEYS)
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        return (h1[:, None] + steps * (h2[:, None] | np.uint64(1))) % np.uint64(self.num_bits)
+
+    def _all_set(self, positions):
+        """Return True for each row of positions whose bits are all set"""
+        set_bits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return set_bits.all(axis=1)
+
+    def add(self, keys):
+        """Add every row of a key frame (see snapshot_keys)
+
+        Only keys the filter did not already report as present are counted,
+        so re-adding loaded keys does not bring saturation closer.
+        """
+        keys = keys.drop_duplicates()
+        if keys.empty:
+            return
+        positions = self._positions(keys)
+        new = int((~self._all_set(positions)).sum())
+        positions = positions.ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3),
+                         np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+        self.count += new
+
+    def might_contain(self, keys):
+        """Return a boolean array, False where a key has certainly not been added"""
+        if keys.empty:
+            return np.zeros(0, dtype=bool)
+        return self._all_set(self._positions(keys))
+
+def stored_keys(keys, conn):
+    """Return a boolean array, True where trending_data holds the key's day from that snapshot or a newer one
+
+    A key whose snapshot is newer than the stored row is not loaded yet:
+    its upsert replaces the row. Only main.trending_data is searched, so
+    keys of archived months are never confirmed: write_batch drops those
+    rows (shards.drop_archived) before checking keys.
+    """
+    conn.execute('''CREATE TEMP TABLE IF NOT EXISTS batch_loaded_keys (
+        video_id TEXT, trending_date TEXT, region_code TEXT, extracted_at TEXT)''')
+    conn.execute("DELETE FROM temp.batch_loaded_keys")
+    conn.executemany("INSERT INTO temp.batch_loaded_keys VALUES (?, ?, ?, ?)",
+                     zip(*(keys[column].tolist() for column in KEY_COLUMNS)))
+    found = conn.execute('''
+        SELECT DISTINCT b.video_id, b.trending_date, b.region_code, b.extracted_at
+        FROM temp.batch_loaded_keys b
+        JOIN main.trending_data t ON t.video_id = b.video_id
+         AND t.region_code = b.region_code
+         AND substr(t.trending_date, 1, 10) = b.trending_date
+         AND t.extracted_at >= b.extracted_at
+    ''').fetchall()
+    return pd.MultiIndex.from_frame(keys[KEY_COLUMNS]).isin(found)
+
+def drop_loaded(df, key_filter, conn=None):
+    """Return the rows of df whose snapshot key has not been loaded yet
+
+    Keys the filter has never seen are kept without touching the database.
+    With conn, the filter's positives are confirmed in one query so false
+    positives are kept too; without it they are dropped.
+    """
+    keys = snapshot_keys(df)
+    maybe_loaded = key_filter.might_contain(keys)
+    if conn is not None and maybe_loaded.any():
+        maybe_loaded[maybe_loaded] = stored_keys(keys[maybe_loaded], conn)
+    return df[~maybe_loaded]
+
+def rebuild(conn, path=None, capacity=None, fp_rate=None, chunk_size=500_000):
+    """Rebuild the filter from every key in trending_data and its monthly shards
+
+    Shards are attached one at a time, so any number of archived months can
+    be read. The filter is sized for at least twice the stored keys.
+    """
+    months = archived_months(conn)
+    stored = conn.execute("SELECT COUNT(*) FROM main.trending_data").fetchone()[0]
+    if months:
+        stored += conn.execute("SELECT SUM(row_count) FROM main.trending_shards").fetchone()[0]
+    capacity = capacity or max(int(os.getenv('BLOOM_CAPACITY', DEFAULT_CAPACITY)), 2 * stored)
+    key_filter = LoadedKeyFilter(path, capacity, fp_rate)
+    for schema in each_month_schema(conn):
+        for chunk in pd.read_sql_query(f"SELECT {', '.join(KEY_COLUMNS)} FROM {schema}.trending_data",
+                                       conn, chunksize=chunk_size):
+            key_filter.add(snapshot_keys(chunk))
+    key_filter.save()
+    return key_filter
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the Bloom filter of loaded snapshot keys")
+    parser.add_argument('--rebuild', action='store_true', help="rebuild the filter from trending_data and its shards")
+    parser.add_argument('--capacity', type=int, help="keys the filter is sized for (default BLOOM_CAPACITY)")
+    parser.add_argument('--fp-rate', type=float, help="target false-positive rate (default BLOOM_FP_RATE)")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        conn = connect()
+        key_filter = rebuild(conn, capacity=args.capacity, fp_rate=args.fp_rate)
+        conn.close()
+        print(f"Rebuilt {key_filter.path}")
+    else:
+        key_filter = LoadedKeyFilter.load()
+
+    print(f"Keys: {key_filter.count:,} of {key_filter.capacity:,} capacity, "
+          f"{key_filter.num_bits // 8 / 1024**2:.1f} MB, {key_filter.num_hashes} hashes, "
+          f"target false positives {key_filter.fp_rate:.4%}")
+    if key_filter.saturated:
+        print("Filter is over capacity; run with --rebuild")
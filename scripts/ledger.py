@@ -0,0 +1,76 @@
+import hashlib
+import io
+import json
+import os
+from datetime import datetime
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(script_dir)
+
+DEFAULT_LEDGER_PATH = os.path.join(project_dir, 'data', 'cache', 'processed_files.json')
+
+class ProcessedLedger:
+    """Persistent record of the raw files a stage has processed, keyed by path
+
+    Each entry keeps the file's size, mtime and SHA-256. A file whose size
+    and mtime still match is skipped without reading it; a touched file is
+    skipped only if its content hash is unchanged.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('PROCESSED_LEDGER_PATH', DEFAULT_LEDGER_PATH)
+        self.entries = {}
+
+    @classmethod
+    def load(cls, path=None):
+        """Load the ledger from disk, starting empty if the file does not exist"""
+        ledger = cls(path)
+        if os.path.exists(ledger.path):
+            with open(ledger.path, encoding='utf-8') as f:
+                ledger.entries = json.load(f)
+        return ledger
+
+    def save(self):
+        """Write the ledger to disk atomically"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def is_processed(self, path):
+        """Return True if path was processed and its content has not changed since"""
+        entry = self.entries.get(os.path.abspath(path))
+        if entry is None:
+            return False
+        stat = os.stat(path)
+        if entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return True
+        if entry['size'] != stat.st_size:
+            return False
+        with open(path, 'rb') as f:
+            unchanged = hashlib.sha256(f.read()).hexdigest() == entry['sha256']
+        if unchanged:
+            entry['mtime'] = stat.st_mtime
+        return unchanged
+
+    def unprocessed(self, paths):
+        """Return the paths that are new or changed, in order"""
+        return [path for path in paths if not self.is_processed(path)]
+
+    def record(self, path, content, output=None):
+        """Mark path as processed with the bytes that were actually read"""
+        stat = os.stat(path)
+        self.entries[os.path.abspath(path)] = {
+            'size': len(content),
+            'mtime': stat.st_mtime if stat.st_size == len(content) else None,
+            'sha256': hashlib.sha256(content).hexdigest(),
+            'processed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'output': output
+        }
+
+def read_snapshot(path):
+    """Return (bytes, file-like) for path, so the hash recorded matches the data parsed"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    return content, io.BytesIO(content)
@@ -1,9 +1,16 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import bindparam, create_engine, text
 import pandas as pd
 import os
 from dotenv import load_dotenv
 from datetime import datetime
 
+from schema import read_csv, to_storage
+from tags import explode_tags, remap_tag_ids
+from velocity import VELOCITY_COLUMNS
+
+# Rows per IN (...) list when reading back tag ids
+TAG_CHUNK_SIZE = 1000
+
 # Load environment variables
 load_dotenv()
 
@@ -57,25 +64,59 @@ def load_to_database(df, engine):
         'video_id', 'trending_date', 'region_code', 'view_count',
         'like_count', 'comment_count', 'engagement_rate', 
         'like_rate', 'comment_rate', 'days_to_trend', 'extracted_at'
-    ]]
+    ] + [c for c in VELOCITY_COLUMNS if c in df.columns]]
     
     print(f"- Trending records to load: {len(trending_df)}")
     
     # Load to database
     try:
         print("\nLoading videos to database...")
-        videos_df.to_sql('videos', engine, if_exists='append', index=False, method='multi')
+        to_storage(videos_df).to_sql('videos', engine, if_exists='append', index=False, method='multi')
         print(f"Loaded {len(videos_df)} videos")
         
         print("\nLoading trending data to database...")
-        trending_df.to_sql('trending_data', engine, if_exists='append', index=False, method='multi')
+        to_storage(trending_df).to_sql('trending_data', engine, if_exists='append', index=False, method='multi')
         print(f"Loaded {len(trending_df)} trending records")
         
+        print("\nLoading tags to database...")
+        tag_count, link_count = load_tags_to_database(df, engine)
+        print(f"Loaded {link_count} video tags ({tag_count} distinct tags)")
+        
         return True
     except Exception as e:
         print(f"Error loading data: {str(e)}")
         return False
 
+def load_tags_to_database(df, engine):
+    """Load the tags dictionary and the video_tags bridge for the videos in df"""
+    tags_df, video_tags_df = explode_tags(df)
+    tags = tags_df['tag'].tolist()
+    video_ids = df['video_id'].unique().tolist()
+    
+    select_ids = text("SELECT tag, tag_id FROM tags WHERE tag IN :tags").bindparams(
+        bindparam('tags', expanding=True))
+    delete_links = text("DELETE FROM video_tags WHERE video_id IN :video_ids").bindparams(
+        bindparam('video_ids', expanding=True))
+    
+    with engine.begin() as conn:
+        database_ids = {}
+        for start in range(0, len(tags), TAG_CHUNK_SIZE):
+            chunk = tags[start:start + TAG_CHUNK_SIZE]
+            conn.execute(text("INSERT IGNORE INTO tags (tag) VALUES (:tag)"), [{'tag': tag} for tag in chunk])
+            database_ids.update(conn.execute(select_ids, {'tags': chunk}).fetchall())
+        video_tags_df = remap_tag_ids(video_tags_df, tags_df, database_ids)
+        
+        # Replace each loaded video's tag set so edited tags do not leave stale rows
+        for start in range(0, len(video_ids), TAG_CHUNK_SIZE):
+            conn.execute(delete_links, {'video_ids': video_ids[start:start + TAG_CHUNK_SIZE]})
+        if len(video_tags_df):
+            conn.execute(
+                text("INSERT IGNORE INTO video_tags (video_id, tag_id) VALUES (:video_id, :tag_id)"),
+                video_tags_df.to_dict('records')
+            )
+    
+    return len(tags_df), len(video_tags_df)
+
 def verify_data(engine):
     """Verify data was loaded correctly"""
     print("\n" + "=" * 60)
@@ -139,7 +180,7 @@ if __name__ == "__main__":
     
     # Read transformed data
     print("Reading transformed data...")
-    df = pd.read_csv(input_path)
+    df = read_csv(input_path)
     print(f"Loaded {len(df)} records")
     
     # Connect to database
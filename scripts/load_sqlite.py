@@ -1,95 +1,288 @@
-import sqlite3
+import numpy as np
 import pandas as pd
 import os
 from datetime import datetime
 
-def create_database():
-    """Create SQLite database and tables"""
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_dir = os.path.dirname(script_dir)
-    db_path = os.path.join(project_dir, 'youtube_analytics.db')
+from db import connect, get_db_path
+from schema import read_csv, to_storage
+from tags import explode_tags, remap_tag_ids
+from migrations import TAG_TABLES, migrate, schema_version
+from video_history import hash_staged, stage_changes, write_history
+from velocity import VELOCITY_COLUMNS, _timestamps, add_velocity
+from ranks import update_chart_ranks
+from near_duplicates import update_near_duplicates
+from regions import update_region_presence
+from streaks import update_trending_streaks
+from anomalies import detect_anomalies
+from shards import drop_archived
+import key_index
+
+VIDEO_COLUMNS = [
+    'video_id', 'title', 'channel_id', 'channel_name',
+    'category_id', 'published_at', 'duration_minutes', 'tags'
+]
+
+TRENDING_COLUMNS = [
+    'video_id', 'trending_date', 'region_code', 'view_count',
+    'like_count', 'comment_count', 'engagement_rate', 
+    'like_rate', 'comment_rate', 'days_to_trend', 'extracted_at'
+]
+
+# One row per video, day and region; loads upsert on this key (idx_trending_unique)
+TRENDING_KEY = ['video_id', 'trending_date', 'region_code']
+
+# Batches at least this large drop and rebuild secondary indexes around the merge
+STAGING_REBUILD_ROWS = int(os.getenv('STAGING_REBUILD_ROWS', 1_000_000))
+
+def create_database(db_path=None):
+    """Create the SQLite database or upgrade it to the latest schema
+
+    Existing tables and rows are kept; only pending migrations run.
+    """
+    db_path = db_path or get_db_path()
     
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    conn = connect(db_path)
+    applied = migrate(conn)
+    print(f"Database ready: {db_path} (schema version {schema_version(conn)}, "
+          f"{len(applied)} migrations applied)")
+    return conn
+
+def trending_columns(df):
+    """Return the trending_data columns to write for df (velocity columns only when computed)"""
+    return TRENDING_COLUMNS + [c for c in VELOCITY_COLUMNS if c in df.columns]
+
+def _datetime_text(series):
+    """Format a datetime column like str(Timestamp), e.g. '2025-12-25 00:00:00+00:00'"""
+    suffix = ''
+    if series.dt.tz is not None:
+        series, suffix = series.dt.tz_convert('UTC').dt.tz_localize(None), '+00:00'
+    values = series.to_numpy(dtype='datetime64[ns]')
+    if (values[~np.isnat(values)].astype('int64') % 1_000_000_000).any():
+        return [str(value) + suffix for value in series.dt.strftime('%Y-%m-%d %H:%M:%S.%f')]
+    # numpy formats whole seconds much faster than pandas does
+    text = np.datetime_as_string(values, unit='s').tolist()
+    return [value.replace('T', ' ') + suffix for value in text]
+
+def sqlite_rows(df):
+    """Return the rows of df as tuples that sqlite3 can bind
+
+    Datetimes become text in the format to_sql writes and missing values
+    become None. Columns are converted whole, not row by row.
+    """
+    df = to_storage(df)
+    columns = []
+    for column in df.columns:
+        series = df[column]
+        missing = series.isna().to_numpy()
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            values = _datetime_text(series)
+        else:
+            values = series.tolist()
+        if missing.any():
+            values = [None if is_missing else value for value, is_missing in zip(values, missing)]
+        columns.append(values)
+    return list(zip(*columns))
+
+def stage_rows(conn, table, columns, rows):
+    """Write rows into a fresh TEMP copy of table's columns; returns the staging table name
+
+    The staging table has no indexes, so one executemany is a plain append.
+    """
+    staging = f'staging_{table}'
+    conn.execute(f"DROP TABLE IF EXISTS temp.{staging}")
+    conn.execute(f"CREATE TEMP TABLE {staging} AS SELECT {', '.join(columns)} FROM main.{table} WHERE 0")
+    conn.executemany(f"INSERT INTO temp.{staging} VALUES ({', '.join('?' * len(columns))})", rows)
+    return staging
+
+def drop_secondary_indexes(conn, table):
+    """Drop the non-unique indexes of table; returns the statements that recreate them
+
+    Unique indexes stay, since the ON CONFLICT merges rely on them.
+    """
+    indexes = conn.execute('''
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL AND sql NOT LIKE 'CREATE UNIQUE%'
+    ''', (table,)).fetchall()
+    for name, _ in indexes:
+        conn.execute(f"DROP INDEX {name}")
+    return [sql for _, sql in indexes]
+
+def merge_staged(conn, table, rows, merge_sql, rebuild_indexes):
+    """Run merge_sql and return the rows it changed, rebuilding table's indexes around it if asked
+
+    rebuild_indexes=None rebuilds when the batch has at least
+    STAGING_REBUILD_ROWS rows: one sorted index build is then cheaper than
+    the per-row index updates.
+    """
+    if rebuild_indexes is None:
+        rebuild_indexes = rows >= STAGING_REBUILD_ROWS
+    indexes = drop_secondary_indexes(conn, table) if rebuild_indexes else []
+    changes_before = conn.total_changes
+    conn.execute(merge_sql)
+    changed = conn.total_changes - changes_before
+    for statement in indexes:
+        conn.execute(statement)
+    return changed
+
+def insert_videos(df, conn, rebuild_indexes=None):
+    """Insert new videos and version changed ones; returns (new, changed, unchanged)
+
+    The batch is staged in a TEMP table where each video's content hash is
+    computed and compared with the stored one, so only new and changed
+    videos are written: videos gets their current version and
+    videos_history the versions closed and opened. The caller commits.
+    """
+    # The latest snapshot of a video in the batch carries its current metadata
+    latest_last = np.argsort(_timestamps(df['extracted_at']), kind='stable')
+    videos_df = df.iloc[latest_last].drop_duplicates(subset=['video_id'], keep='last')
+    videos_df = videos_df[VIDEO_COLUMNS].assign(valid_from=videos_df['extracted_at'], content_hash=None)
+    columns = VIDEO_COLUMNS + ['valid_from', 'content_hash']
+    staging = stage_rows(conn, 'videos', columns, sqlite_rows(videos_df))
+    hash_staged(conn, staging)
+    new, changed, unchanged = stage_changes(conn, staging)
+    write_history(conn)
+
+    updates = ', '.join(f'{column} = excluded.{column}' for column in columns if column != 'video_id')
+    # WHERE true keeps ON CONFLICT from parsing as part of the SELECT
+    merge_staged(conn, 'videos', new + changed, f'''
+        INSERT INTO videos ({', '.join(columns)})
+        SELECT {', '.join(columns)} FROM temp.video_changes WHERE true
+        ORDER BY video_id
+        ON CONFLICT (video_id) DO UPDATE SET {updates}
+    ''', rebuild_indexes)
+    return new, changed, unchanged
+
+def insert_trending(df, conn, rebuild_indexes=None):
+    """Upsert the trending snapshots of df; returns (inserted, updated, unchanged)
+
+    A snapshot already stored for the same video, day and region is updated
+    if this one was extracted later, or at the same time with other values,
+    so reruns are idempotent and rewrite nothing. The batch is staged in a
+    TEMP table and merged in key order with one INSERT ... SELECT. Inserted
+    rows are the ones given ids past the stored maximum (ids are
+    AUTOINCREMENT); the other rows the merge changed were updates, and the
+    rest were kept as stored. The caller commits.
+    """
+    columns = trending_columns(df)
+    values = [column for column in columns if column not in TRENDING_KEY]
+    updates = ', '.join(f'{column} = excluded.{column}' for column in values)
+    stored = ', '.join(f'trending_data.{column}' for column in values)
+    staged = ', '.join(f'excluded.{column}' for column in values)
+    staging = stage_rows(conn, 'trending_data', columns, sqlite_rows(df[columns]))
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM main.trending_data").fetchone()[0]
+    changed = merge_staged(conn, 'trending_data', len(df), f'''
+        INSERT INTO trending_data ({', '.join(columns)})
+        SELECT {', '.join(columns)} FROM temp.{staging} WHERE true
+        ORDER BY {', '.join(TRENDING_KEY)}, extracted_at
+        ON CONFLICT ({', '.join(TRENDING_KEY)}) DO UPDATE SET {updates}
+        WHERE excluded.extracted_at > trending_data.extracted_at
+           OR (excluded.extracted_at = trending_data.extracted_at AND ({stored}) IS NOT ({staged}))
+    ''', rebuild_indexes)
+    inserted = conn.execute("SELECT COUNT(*) FROM main.trending_data WHERE id > ?", (last_id,)).fetchone()[0]
+    return inserted, changed - inserted, len(df) - changed
+
+def write_batch(df, conn, key_filter=None):
+    """Write one transformed batch to every table; returns a dict of the rows each step wrote
+
+    This is the whole load of one refresh, shared by main.load_to_sqlite,
+    the writer thread and load_data. With key_filter (a LoadedKeyFilter),
+    snapshots already loaded are skipped after the chart is recorded. The
+    caller commits, then adds the batch's keys to key_filter.
+    """
+    counts = {}
     
-    # Create tables
-    cursor.executescript('''
-        DROP TABLE IF EXISTS trending_data;
-        DROP TABLE IF EXISTS videos;
-        DROP TABLE IF EXISTS categories;
-        
-        CREATE TABLE categories (
-            category_id INTEGER PRIMARY KEY,
-            category_name TEXT NOT NULL
-        );
-        
-        INSERT INTO categories VALUES
-        (1, 'Film & Animation'),
-        (2, 'Autos & Vehicles'),
-        (10, 'Music'),
-        (15, 'Pets & Animals'),
-        (17, 'Sports'),
-        (20, 'Gaming'),
-        (22, 'People & Blogs'),
-        (23, 'Comedy'),
-        (24, 'Entertainment'),
-        (25, 'News & Politics'),
-        (26, 'Howto & Style'),
-        (27, 'Education'),
-        (28, 'Science & Technology');
-        
-        CREATE TABLE videos (
-            video_id TEXT PRIMARY KEY,
-            title TEXT NOT NULL,
-            channel_id TEXT NOT NULL,
-            channel_name TEXT NOT NULL,
-            category_id INTEGER,
-            published_at TEXT NOT NULL,
-            duration_minutes REAL,
-            tags TEXT
-        );
-        
-        CREATE TABLE trending_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            video_id TEXT NOT NULL,
-            trending_date TEXT NOT NULL,
-            region_code TEXT NOT NULL,
-            view_count INTEGER NOT NULL,
-            like_count INTEGER NOT NULL,
-            comment_count INTEGER NOT NULL,
-            engagement_rate REAL,
-            like_rate REAL,
-            comment_rate REAL,
-            days_to_trend INTEGER,
-            extracted_at TEXT NOT NULL,
-            FOREIGN KEY (video_id) REFERENCES videos(video_id)
-        );
-    ''')
+    # Chart positions and rank movement, from the whole batch so no snapshot loses part of its chart
+    counts['chart_ranks'] = update_chart_ranks(df, conn)
     
-    conn.commit()
-    print(f"Database created: {db_path}")
-    return conn
+    # Snapshots of months already moved to a read-only shard cannot be merged
+    kept = drop_archived(df, conn)
+    counts['archived_skipped'] = len(df) - len(kept)
+    df = kept
+    
+    # Snapshots already loaded (Bloom filter, positives confirmed in main, which holds the open months)
+    kept = df if key_filter is None else key_index.drop_loaded(df, key_filter, conn)
+    counts['already_loaded'] = len(df) - len(kept)
+    df = kept
+    
+    # Videos and trending data, merged from TEMP staging tables
+    counts['videos_new'], counts['videos_changed'], counts['videos_unchanged'] = insert_videos(df, conn)
+    counts['trending_new'], counts['trending_updated'], counts['trending_unchanged'] = insert_trending(df, conn)
+    
+    # Tag dictionary and video_tags bridge
+    counts['tags'], counts['video_tags'] = load_tags(conn)
+    
+    # Consecutive trending days per video and region
+    counts['streaks'] = update_trending_streaks(df, conn)
+    
+    # Sudden spikes or stalls in view growth
+    counts['anomalies'] = detect_anomalies(df, conn)
+    
+    # Per-day region presence bitmask
+    counts['region_presence'] = update_region_presence(df, conn)
+    
+    # Reuploads and near-identical videos
+    counts['near_duplicates'] = update_near_duplicates(df, conn)
+    return counts
 
 def load_data(df, conn):
     """Load data to SQLite"""
-    # Videos data
-    videos_df = df[[
-        'video_id', 'title', 'channel_id', 'channel_name', 
-        'category_id', 'published_at', 'duration_minutes', 'tags'
-    ]].drop_duplicates(subset=['video_id'])
+    if 'view_velocity' not in df.columns:
+        df = add_velocity(df, conn)
+    
+    counts = write_batch(df, conn)
+    print(f"Loaded {counts['videos_new']} new and {counts['videos_changed']} changed videos "
+          f"({counts['videos_unchanged']} unchanged)")
+    print(f"Loaded {counts['trending_new']} new and {counts['trending_updated']} updated trending records "
+          f"({counts['trending_unchanged']} unchanged)")
+    print(f"Loaded {counts['video_tags']} video tags ({counts['tags']} distinct tags)")
+    print(f"Loaded {counts['chart_ranks']} chart positions")
+    print(f"Updated {counts['streaks']} trending streaks")
+    print(f"Flagged {counts['anomalies']} view growth anomalies")
+    print(f"Updated region presence for {counts['region_presence']} video-days")
+    print(f"Clustered {counts['near_duplicates']} near-duplicate videos")
+    if counts['archived_skipped']:
+        print(f"Skipped {counts['archived_skipped']} records of archived months")
     
-    videos_df.to_sql('videos', conn, if_exists='append', index=False)
-    print(f"Loaded {len(videos_df)} videos")
+    conn.commit()
+    # Refresh planner statistics so the dashboard keeps using QUERY_INDEXES
+    conn.execute("PRAGMA optimize")
+
+def load_tags(conn):
+    """Load the tags dictionary and the video_tags bridge for the batch's new and changed videos
+
+    Reads the videos insert_videos staged, so call it after insert_videos.
+    Tag links are replaced only for videos in temp.video_changes (tags are
+    part of the content hash) and for staged videos with no links yet, so
+    a rerun rewrites nothing. Returns (distinct tags written, video_tags
+    rows written). The caller commits.
+    """
+    cursor = conn.cursor()
+    for statement in TAG_TABLES:
+        cursor.execute(statement)
+    df = pd.read_sql_query('''
+        SELECT s.video_id, s.tags FROM temp.staging_videos s
+        WHERE s.video_id IN (SELECT video_id FROM temp.video_changes)
+           OR NOT EXISTS (SELECT 1 FROM video_tags t WHERE t.video_id = s.video_id)
+    ''', conn)
+    if df.empty:
+        return 0, 0
+    tags_df, video_tags_df = explode_tags(df)
     
-    # Trending data
-    trending_df = df[[
-        'video_id', 'trending_date', 'region_code', 'view_count',
-        'like_count', 'comment_count', 'engagement_rate', 
-        'like_rate', 'comment_rate', 'days_to_trend', 'extracted_at'
-    ]]
+    # Intern new tags, then read back the ids of every tag in the batch
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS batch_tags (tag TEXT PRIMARY KEY)")
+    cursor.execute("DELETE FROM temp.batch_tags")
+    cursor.executemany("INSERT INTO temp.batch_tags (tag) VALUES (?)", ((tag,) for tag in tags_df['tag']))
+    cursor.execute("INSERT OR IGNORE INTO tags (tag) SELECT tag FROM temp.batch_tags")
+    database_ids = dict(cursor.execute(
+        "SELECT t.tag, t.tag_id FROM tags t JOIN temp.batch_tags b ON b.tag = t.tag"
+    ))
+    video_tags_df = remap_tag_ids(video_tags_df, tags_df, database_ids)
     
-    trending_df.to_sql('trending_data', conn, if_exists='append', index=False)
-    print(f"Loaded {len(trending_df)} trending records")
+    cursor.executemany("DELETE FROM video_tags WHERE video_id = ?",
+                       ((video_id,) for video_id in df['video_id'].unique()))
+    cursor.executemany("INSERT OR IGNORE INTO video_tags (video_id, tag_id) VALUES (?, ?)",
+                       video_tags_df.itertuples(index=False, name=None))
+    return len(tags_df), len(video_tags_df)
 
 if __name__ == "__main__":
     print("=" * 60)
@@ -106,11 +299,11 @@ if __name__ == "__main__":
     input_path = os.path.join(transformed_dir, latest_file)
     
     print(f"\nReading: {latest_file}")
-    df = pd.read_csv(input_path)
+    df = read_csv(input_path)
     print(f"Loaded {len(df)} records")
     
-    # Create database and load
-    print("\nCreating database...")
+    # Create or upgrade the database and load
+    print("\nPreparing database...")
     conn = create_database()
     
     print("\nLoading data...")
@@ -124,5 +317,13 @@ if __name__ == "__main__":
     print(f"\nTotal videos: {video_count}")
     print(f"Total trending records: {trending_count}")
     
+    # Add the loaded snapshots to the loaded key filter
+    key_filter = key_index.LoadedKeyFilter.load()
+    key_filter.add(key_index.snapshot_keys(df))
+    key_filter.save()
+    print(f"Updated loaded key filter: {key_filter.path}")
+    if key_filter.saturated:
+        print("Loaded key filter is over capacity; run key_index.py --rebuild")
+    
     conn.close()
     print("\nData loading complete!")
\ No newline at end of file
@@ -1,5 +1,7 @@
+import argparse
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
 
@@ -7,8 +9,15 @@ import logging
 script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, script_dir)
 
+from db import connect, get_db_path
 from extract import fetch_trending_videos
 from transform import transform_data
+from load_sqlite import write_batch
+from migrations import migrate
+from velocity import add_velocity
+from key_index import LoadedKeyFilter, snapshot_keys
+from validate import validate_data, write_quarantine
+from writer import SQLiteWriter
 
 # Setup logging with UTF-8 encoding
 log_dir = os.path.join(os.path.dirname(script_dir), 'logs')
@@ -23,70 +32,78 @@ logging.basicConfig(
     ]
 )
 
-def load_to_sqlite(df):
-    """Load data to SQLite database with duplicate handling"""
-    import sqlite3
-    
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_dir = os.path.dirname(script_dir)
-    db_path = os.path.join(project_dir, 'youtube_analytics.db')
-    
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    videos_loaded = 0
-    videos_skipped = 0
-    trending_loaded = 0
-    
-    # Load videos (skip duplicates)
-    videos_df = df[[
-        'video_id', 'title', 'channel_id', 'channel_name', 
-        'category_id', 'published_at', 'duration_minutes', 'tags'
-    ]].drop_duplicates(subset=['video_id'])
-    
-    for _, row in videos_df.iterrows():
-        try:
-            cursor.execute("""
-                INSERT OR IGNORE INTO videos 
-                (video_id, title, channel_id, channel_name, category_id, published_at, duration_minutes, tags)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, tuple(row))
-            if cursor.rowcount > 0:
-                videos_loaded += 1
-            else:
-                videos_skipped += 1
-        except Exception as e:
-            logging.warning(f"Error inserting video {row['video_id']}: {str(e)}")
-    
-    # Load trending data
-    trending_df = df[[
-        'video_id', 'trending_date', 'region_code', 'view_count',
-        'like_count', 'comment_count', 'engagement_rate', 
-        'like_rate', 'comment_rate', 'days_to_trend', 'extracted_at'
-    ]]
-    
-    for _, row in trending_df.iterrows():
-        try:
-            cursor.execute("""
-                INSERT OR REPLACE INTO trending_data 
-                (video_id, trending_date, region_code, view_count, like_count, comment_count, 
-                 engagement_rate, like_rate, comment_rate, days_to_trend, extracted_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, tuple(row))
-            trending_loaded += 1
-        except Exception as e:
-            logging.warning(f"Error inserting trending data: {str(e)}")
-    
-    conn.commit()
-    conn.close()
-    
-    logging.info(f"Videos: {videos_loaded} new, {videos_skipped} already exist")
-    logging.info(f"Trending records: {trending_loaded} loaded")
+def compute_velocity(df):
+    """Add deltas and velocities against the previous stored snapshot of each video
+
+    Reads through a read-only connection: the schema is left to the writer
+    (or load_to_sqlite), and before the first load nothing is stored yet.
+    """
+    if not os.path.exists(get_db_path()):
+        return add_velocity(df, None)
+    conn = connect(read_only=True)
+    try:
+        return add_velocity(df, conn)
+    finally:
+        conn.close()
+
+def log_load_counts(counts):
+    """Log the rows each load step wrote (the dict returned by write_batch)"""
+    logging.info(f"Videos: {counts['videos_new']} new, {counts['videos_changed']} changed, "
+                 f"{counts['videos_unchanged']} unchanged")
+    if counts['already_loaded']:
+        logging.info(f"Skipped {counts['already_loaded']} already loaded records")
+    logging.info(f"Trending records: {counts['trending_new']} inserted, {counts['trending_updated']} updated, "
+                 f"{counts['trending_unchanged']} unchanged")
+    logging.info(f"Tags: {counts['video_tags']} video tags across {counts['tags']} distinct tags")
+    logging.info(f"Chart ranks: {counts['chart_ranks']} positions recorded")
+    logging.info(f"Trending streaks: {counts['streaks']} streaks extended or opened")
+    logging.info(f"Anomalies: {counts['anomalies']} view growth spikes or stalls flagged")
+    logging.info(f"Region presence: {counts['region_presence']} video-days updated")
+    logging.info(f"Near-duplicates: {counts['near_duplicates']} new videos clustered")
+    if counts['archived_skipped']:
+        logging.warning(f"Skipped {counts['archived_skipped']} records of months already archived to shards")
+
+def load_to_sqlite(df, db_path=None, key_filter=None):
+    """Load data to SQLite database with duplicate handling
+
+    Everything is written in one transaction, which is rolled back if any
+    step fails. Snapshots in key_filter that are already stored are skipped.
+    """
+    conn = connect(db_path)
+    try:
+        for version in migrate(conn):
+            logging.info(f"Applied schema migration {version}")
+        
+        counts = write_batch(df, conn, key_filter)
+        conn.commit()
+        # Refresh planner statistics so the dashboard keeps using QUERY_INDEXES
+        conn.execute("PRAGMA optimize")
+        log_load_counts(counts)
+    except Exception as e:
+        conn.rollback()
+        logging.error(f"Load failed, batch rolled back: {str(e)}")
+        return False
+    finally:
+        conn.close()
     
     return True
 
-def run_etl_pipeline(region='US', max_results=50):
-    """Run the complete ETL pipeline"""
+def load_with_writer(df, writer):
+    """Load df through the shared writer and wait for its commit; returns True on success"""
+    try:
+        log_load_counts(writer.submit(df).result())
+    except Exception as e:
+        logging.error(f"Load failed, batch rolled back: {str(e)}")
+        return False
+    return True
+
+def run_etl_pipeline(region='US', max_results=50, profile_memory=False, writer=None):
+    """Run the complete ETL pipeline
+
+    With writer (an SQLiteWriter shared by concurrent pipelines) the batch is
+    loaded and its keys recorded by the writer thread instead of a
+    connection of its own.
+    """
     
     logging.info("=" * 60)
     logging.info("STARTING ETL PIPELINE")
@@ -100,12 +117,33 @@ def run_etl_pipeline(region='US', max_results=50):
         
         # TRANSFORM
         logging.info("\nPHASE 2: Transforming data...")
-        df_transformed = transform_data(df_raw)
+        # The raw frame is not used after this point, so transform it in place
+        df_transformed = transform_data(df_raw, inplace=True, profile_memory=profile_memory)
         logging.info(f"Transformation complete: {len(df_transformed)} records")
         
+        # VALIDATE
+        df_transformed, quarantined = validate_data(df_transformed)
+        if len(quarantined):
+            path = write_quarantine(quarantined)
+            logging.warning(f"Quarantined {len(quarantined)} invalid records to {path}")
+        
+        logging.info("Computing snapshot velocity...")
+        df_transformed = compute_velocity(df_transformed)
+        
         # LOAD
         logging.info("\nPHASE 3: Loading data to database...")
-        success = load_to_sqlite(df_transformed)
+        # Already loaded snapshots are skipped at load time, after their chart is recorded.
+        # The writer keeps its own key filter; only it reads or updates it.
+        if writer is not None:
+            success = load_with_writer(df_transformed, writer)
+        else:
+            key_filter = LoadedKeyFilter.load()
+            success = load_to_sqlite(df_transformed, key_filter=key_filter)
+            if success:
+                key_filter.add(snapshot_keys(df_transformed))
+                key_filter.save()
+                if key_filter.saturated:
+                    logging.warning("Loaded key filter is over capacity; run key_index.py --rebuild")
         
         if success:
             logging.info("\n" + "=" * 60)
@@ -123,6 +161,12 @@ def run_etl_pipeline(region='US', max_results=50):
         return False
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the YouTube trending ETL pipeline")
+    parser.add_argument('--regions', nargs='+', default=['US'],
+                        help="region codes to refresh concurrently through one SQLite writer")
+    parser.add_argument('--max-results', type=int, default=50)
+    args = parser.parse_args()
+    
     # Set console to UTF-8
     if sys.platform == 'win32':
         import codecs
@@ -135,8 +179,12 @@ if __name__ == "__main__":
     print("=" * 60)
     print("\n")
     
-    # Run the pipeline
-    success = run_etl_pipeline(region='US', max_results=50)
+    # Run the pipeline, one producer per region, all loading through one writer
+    with SQLiteWriter(key_filter=LoadedKeyFilter.load()) as writer:
+        with ThreadPoolExecutor(max_workers=len(args.regions)) as pool:
+            results = list(pool.map(lambda region: run_etl_pipeline(region, args.max_results, writer=writer),
+                                    args.regions))
+    success = all(results)
     
     if success:
         print("\nPipeline execution complete! Check logs for details.\n")
@@ -0,0 +1,266 @@
+import argparse
+import os
+
+from db import connect
+from velocity import SNAPSHOT_INDEX
+from ranks import RANK_TABLES
+from near_duplicates import NEAR_DUPLICATE_TABLES
+from regions import REGION_TABLES
+from streaks import STREAK_TABLES
+from anomalies import ANOMALY_TABLES
+from shards import SHARD_TABLES
+from retention import ROLLUP_TABLES
+from video_history import HASHED_COLUMNS, VIDEO_HISTORY_TABLES, register_content_hash
+
+BATCH_ROWS = int(os.getenv('MIGRATION_BATCH_ROWS', 50_000))  # rows per committed step of a batched migration
+
+CATEGORIES = [
+    (1, 'Film & Animation'), (2, 'Autos & Vehicles'), (10, 'Music'), (15, 'Pets & Animals'),
+    (17, 'Sports'), (20, 'Gaming'), (22, 'People & Blogs'), (23, 'Comedy'), (24, 'Entertainment'),
+    (25, 'News & Politics'), (26, 'Howto & Style'), (27, 'Education'), (28, 'Science & Technology')
+]
+
+# The tables of the first release
+CORE_TABLES = [
+    '''CREATE TABLE IF NOT EXISTS categories (
+        category_id INTEGER PRIMARY KEY,
+        category_name TEXT NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS videos (
+        video_id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        channel_id TEXT NOT NULL,
+        channel_name TEXT NOT NULL,
+        category_id INTEGER,
+        published_at TEXT NOT NULL,
+        duration_minutes REAL,
+        tags TEXT
+    )''',
+    '''CREATE TABLE IF NOT EXISTS trending_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        video_id TEXT NOT NULL,
+        trending_date TEXT NOT NULL,
+        region_code TEXT NOT NULL,
+        view_count INTEGER NOT NULL,
+        like_count INTEGER NOT NULL,
+        comment_count INTEGER NOT NULL,
+        engagement_rate REAL,
+        like_rate REAL,
+        comment_rate REAL,
+        days_to_trend INTEGER,
+        extracted_at TEXT NOT NULL,
+        FOREIGN KEY (video_id) REFERENCES videos(video_id)
+    )'''
+]
+
+# trending_data columns added after the first release, with their SQLite types
+TRENDING_EXTRA_COLUMNS = {
+    'hours_since_prev': 'REAL',
+    'view_delta': 'INTEGER',
+    'like_delta': 'INTEGER',
+    'comment_delta': 'INTEGER',
+    'view_velocity': 'REAL',
+    'like_velocity': 'REAL',
+    'comment_velocity': 'REAL'
+}
+
+# One row per video, day and region; loads upsert on this key
+TRENDING_UNIQUE_INDEX = '''CREATE UNIQUE INDEX IF NOT EXISTS idx_trending_unique
+    ON trending_data (video_id, trending_date, region_code)'''
+
+# Tag dictionary and video->tag bridge; IF NOT EXISTS so loaders can run them on older databases
+TAG_TABLES = [
+    '''CREATE TABLE IF NOT EXISTS tags (
+        tag_id INTEGER PRIMARY KEY,
+        tag TEXT NOT NULL UNIQUE
+    )''',
+    '''CREATE TABLE IF NOT EXISTS video_tags (
+        video_id TEXT NOT NULL,
+        tag_id INTEGER NOT NULL,
+        PRIMARY KEY (video_id, tag_id),
+        FOREIGN KEY (video_id) REFERENCES videos(video_id),
+        FOREIGN KEY (tag_id) REFERENCES tags(tag_id)
+    ) WITHOUT ROWID''',
+    'CREATE INDEX IF NOT EXISTS idx_video_tags_tag ON video_tags (tag_id, video_id)'
+]
+
+# Secondary indexes behind the dashboard and sql/analysis_queries.sql
+# (checked by benchmarks/check_query_plans.py). The trending_data ones
+# cover the columns those queries read, so joins never visit the table.
+QUERY_INDEXES = [
+    '''CREATE INDEX IF NOT EXISTS idx_trending_video_metrics
+        ON trending_data (video_id, view_count, engagement_rate, like_count)''',
+    'CREATE INDEX IF NOT EXISTS idx_trending_views ON trending_data (view_count DESC)',
+    '''CREATE INDEX IF NOT EXISTS idx_trending_date
+        ON trending_data (trending_date, video_id, view_count, engagement_rate)''',
+    'CREATE INDEX IF NOT EXISTS idx_videos_category ON videos (category_id, video_id)',
+    'CREATE INDEX IF NOT EXISTS idx_videos_channel ON videos (channel_name, video_id)'
+]
+
+# Lets analysis query 15 seek the multi-region video-days before ANALYZE
+# has run (an analyzed database skip-scans idx_region_presence_day)
+PRESENCE_QUERY_INDEXES = [
+    '''CREATE INDEX IF NOT EXISTS idx_region_presence_count
+        ON video_region_presence (region_count, trending_date, region_mask)'''
+]
+
+# Where an interrupted batched migration resumes
+PROGRESS_TABLE = '''CREATE TABLE IF NOT EXISTS migration_progress (
+    version INTEGER PRIMARY KEY,
+    last_id INTEGER NOT NULL
+)'''
+
+def run_batched(conn, version, table, statements, batch_rows=None):
+    """Run statements over table in rowid ranges of batch_rows, committing after each
+
+    statements (one SQL string or a list) bind :start and :end (inclusive).
+    The last finished range is stored in migration_progress, so a rerun
+    after an interruption resumes there, and the write lock is only held
+    for one range at a time.
+    """
+    batch_rows = batch_rows or BATCH_ROWS
+    conn.execute(PROGRESS_TABLE)
+    row = conn.execute("SELECT last_id FROM migration_progress WHERE version = ?", (version,)).fetchone()
+    start = row[0] + 1 if row else 0
+    max_id = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+    while start <= max_id:
+        end = start + batch_rows - 1
+        for statement in [statements] if isinstance(statements, str) else statements:
+            conn.execute(statement, {'start': start, 'end': end})
+        conn.execute("INSERT OR REPLACE INTO migration_progress VALUES (?, ?)", (version, end))
+        conn.commit()
+        start = end + 1
+    conn.execute("DELETE FROM migration_progress WHERE version = ?", (version,))
+
+def create_core_tables(conn, batch_rows):
+    """Create categories, videos and trending_data"""
+    for statement in CORE_TABLES:
+        conn.execute(statement)
+    conn.executemany("INSERT OR IGNORE INTO categories VALUES (?, ?)", CATEGORIES)
+
+def add_velocity_columns(conn, batch_rows):
+    """Add the snapshot delta and velocity columns and the previous-snapshot index"""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(trending_data)")}
+    for column, column_type in TRENDING_EXTRA_COLUMNS.items():
+        if column not in existing:
+            conn.execute(f"ALTER TABLE trending_data ADD COLUMN {column} {column_type}")
+    conn.execute(SNAPSHOT_INDEX)
+
+def add_trending_unique_key(conn, batch_rows):
+    """Dedupe trending_data and add its unique (video_id, trending_date, region_code) key
+
+    Of several rows for one key the one with the latest extracted_at is
+    kept. The delete runs in id ranges; the lookup uses idx_trending_snapshot.
+    """
+    run_batched(conn, 3, 'trending_data', '''
+        DELETE FROM trending_data WHERE id BETWEEN :start AND :end AND EXISTS (
+            SELECT 1 FROM trending_data newer
+            WHERE newer.video_id = trending_data.video_id
+              AND newer.region_code = trending_data.region_code
+              AND newer.trending_date = trending_data.trending_date
+              AND (newer.extracted_at > trending_data.extracted_at
+                   OR (newer.extracted_at = trending_data.extracted_at AND newer.id > trending_data.id))
+        )
+    ''', batch_rows)
+    conn.execute(TRENDING_UNIQUE_INDEX)
+
+def create_derived_tables(conn, batch_rows):
+    """Create the tag, chart rank, near-duplicate, region, streak and anomaly tables"""
+    for statement in TAG_TABLES + RANK_TABLES + NEAR_DUPLICATE_TABLES + REGION_TABLES + STREAK_TABLES + ANOMALY_TABLES:
+        conn.execute(statement)
+
+def create_query_indexes(conn, batch_rows):
+    """Create the dashboard and analysis query indexes"""
+    for statement in QUERY_INDEXES:
+        conn.execute(statement)
+
+def add_presence_query_indexes(conn, batch_rows):
+    """Create the index behind the multi-region presence query"""
+    for statement in PRESENCE_QUERY_INDEXES:
+        conn.execute(statement)
+
+def add_video_history(conn, batch_rows):
+    """Add content hashes to videos and seed videos_history with the stored versions
+
+    A stored video's version starts at its first snapshot, or at its
+    publication if it has none.
+    """
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(videos)")}
+    for column in ('content_hash', 'valid_from'):
+        if column not in existing:
+            conn.execute(f"ALTER TABLE videos ADD COLUMN {column} TEXT")
+    for statement in VIDEO_HISTORY_TABLES:
+        conn.execute(statement)
+    register_content_hash(conn)
+    columns = ['video_id', 'valid_from'] + HASHED_COLUMNS + ['content_hash']
+    run_batched(conn, 6, 'videos', [
+        f'''UPDATE videos SET content_hash = video_hash({', '.join(HASHED_COLUMNS)}),
+               valid_from = COALESCE(valid_from, (SELECT MIN(t.extracted_at) FROM trending_data t
+                                                  WHERE t.video_id = videos.video_id), published_at)
+           WHERE rowid BETWEEN :start AND :end AND content_hash IS NULL''',
+        f'''INSERT INTO videos_history ({', '.join(columns)})
+           SELECT {', '.join(columns)} FROM videos WHERE rowid BETWEEN :start AND :end
+           ON CONFLICT (video_id, valid_from) DO NOTHING'''
+    ], batch_rows)
+
+def create_shard_registry(conn, batch_rows):
+    """Create the registry of the monthly trending_data shards"""
+    for statement in SHARD_TABLES:
+        conn.execute(statement)
+
+def create_rollup_tables(conn, batch_rows):
+    """Create the daily rollup of snapshots past the retention window"""
+    for statement in ROLLUP_TABLES:
+        conn.execute(statement)
+
+# Append only: a database at user_version N has had the first N applied.
+# Every migration is additive and safe to rerun, so databases created
+# before versioning (user_version 0) are upgraded in place.
+MIGRATIONS = [
+    create_core_tables,
+    add_velocity_columns,
+    add_trending_unique_key,
+    create_derived_tables,
+    create_query_indexes,
+    add_video_history,
+    create_shard_registry,
+    create_rollup_tables,
+    add_presence_query_indexes
+]
+
+def schema_version(conn):
+    """Return the number of MIGRATIONS applied to the database"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn, batch_rows=None):
+    """Apply the pending MIGRATIONS in order; returns the versions applied
+
+    Each migration is committed together with its user_version bump.
+    """
+    applied = []
+    if not conn.execute("SELECT 1 FROM sqlite_master").fetchone():
+        # Only settable before the first table (and, in WAL mode, applied by a
+        # VACUUM, instant on an empty file); lets retention.py return freed pages
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    for version, migration in enumerate(MIGRATIONS, start=1):
+        if version <= schema_version(conn):
+            continue
+        migration(conn, batch_rows)
+        conn.execute(f"PRAGMA user_version = {version}")
+        conn.commit()
+        applied.append(version)
+    return applied
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upgrade the SQLite schema to the latest version")
+    parser.add_argument('--batch-rows', type=int, help="rows per committed step of batched migrations")
+    parser.add_argument('--status', action='store_true', help="only print the current and latest version")
+    args = parser.parse_args()
+
+    conn = connect()
+    print(f"Schema version: {schema_version(conn)} (latest {len(MIGRATIONS)})")
+    if not args.status:
+        for version in migrate(conn, args.batch_rows):
+            print(f"Applied {version}: {MIGRATIONS[version - 1].__doc__.splitlines()[0]}")
+    conn.close()
@@ -0,0 +1,218 @@
+import argparse
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from db import connect
+
+NUM_PERMUTATIONS = 64
+BANDS = 16                      # 16 bands x 4 rows: ~50% similarity to become a candidate
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SIMILARITY_THRESHOLD = 0.6      # estimated Jaccard needed to join a cluster
+CHUNK_TOKENS = 200_000          # tokens hashed per batch (x 64 permutations x 8 bytes)
+MAX_BUCKET_CANDIDATES = 50      # stored bucket members compared per new video and band
+
+# Fixed seeds so signatures stay comparable across runs
+_rng = np.random.default_rng(20251225)
+_MULTIPLIERS = _rng.integers(1, 2**63, NUM_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_OFFSETS = _rng.integers(0, 2**63, NUM_PERMUTATIONS, dtype=np.uint64)
+_BAND_MULTIPLIERS = _rng.integers(1, 2**63, ROWS_PER_BAND, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+NEAR_DUPLICATE_TABLES = [
+    '''CREATE TABLE IF NOT EXISTS minhash_signatures (
+        video_id TEXT PRIMARY KEY,
+        signature BLOB NOT NULL,
+        cluster_id TEXT NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_minhash_cluster ON minhash_signatures (cluster_id)',
+    '''CREATE TABLE IF NOT EXISTS lsh_buckets (
+        band INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        video_id TEXT NOT NULL,
+        PRIMARY KEY (band, bucket, video_id)
+    ) WITHOUT ROWID'''
+]
+
+def tokenize(df):
+    """Return (doc, token_hash) pairs for the title words and tags of each row of df"""
+    text = (df['title'].fillna('').astype(str) + ' ' +
+            df['tags'].fillna('').astype(str).str.replace(',', ' ', regex=False))
+    tokens = text.str.lower().str.split().explode()
+    tokens = tokens[tokens.str.len() > 1]
+    pairs = pd.DataFrame({'doc': tokens.index.to_numpy(), 'token': tokens.to_numpy()}).drop_duplicates()
+    token_hash = pd.util.hash_pandas_object(pairs['token'], index=False, categorize=False).to_numpy()
+    return pairs['doc'].to_numpy(), token_hash
+
+def minhash_signatures(df):
+    """Return (signatures, has_tokens): a uint32 (len(df), NUM_PERMUTATIONS) array and a mask
+
+    Rows without any token get an all-max signature and has_tokens False.
+    """
+    df = df.reset_index(drop=True)
+    docs, token_hash = tokenize(df)
+    order = np.argsort(docs, kind='stable')
+    docs, token_hash = docs[order], token_hash[order]
+
+    signatures = np.full((len(df), NUM_PERMUTATIONS), np.iinfo(np.uint32).max, dtype=np.uint32)
+    starts = np.flatnonzero(np.r_[True, docs[1:] != docs[:-1]]) if len(docs) else np.array([], dtype=int)
+
+    # Hash whole documents per chunk with multiply-shift permutations and take
+    # the per-document minimum with reduceat
+    chunk_start = 0
+    while chunk_start < len(starts):
+        chunk_end = max(int(np.searchsorted(starts, starts[chunk_start] + CHUNK_TOKENS)), chunk_start + 1)
+        first = starts[chunk_start]
+        last = starts[chunk_end] if chunk_end < len(starts) else len(docs)
+        hashed = (token_hash[first:last, None] * _MULTIPLIERS + _OFFSETS) >> np.uint64(32)
+        minima = np.minimum.reduceat(hashed, starts[chunk_start:chunk_end] - first, axis=0)
+        signatures[docs[starts[chunk_start:chunk_end]]] = minima.astype(np.uint32)
+        chunk_start = chunk_end
+
+    has_tokens = np.zeros(len(df), dtype=bool)
+    has_tokens[docs] = True
+    return signatures, has_tokens
+
+def band_buckets(signatures):
+    """Return an (n, BANDS) int64 array of LSH bucket keys"""
+    bands = signatures.reshape(len(signatures), BANDS, ROWS_PER_BAND).astype(np.uint64)
+    return (bands * _BAND_MULTIPLIERS).sum(axis=2).view(np.int64)
+
+def update_near_duplicates(df, conn, threshold=SIMILARITY_THRESHOLD):
+    """Index the videos of df that are not indexed yet and assign near-duplicate clusters
+
+    Candidates come only from shared LSH buckets (never all pairs) and are
+    confirmed by estimated Jaccard similarity. Returns the number of new
+    videos that joined an existing or new multi-video cluster. The caller commits.
+    """
+    for statement in NEAR_DUPLICATE_TABLES:
+        conn.execute(statement)
+
+    videos = df[['video_id', 'title', 'tags']].drop_duplicates(subset=['video_id'])
+    videos = videos.assign(video_id=videos['video_id'].astype(str))
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS batch_video_ids (video_id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.batch_video_ids")
+    conn.executemany("INSERT INTO temp.batch_video_ids VALUES (?)", ((v,) for v in videos['video_id']))
+    indexed = {row[0] for row in conn.execute(
+        "SELECT s.video_id FROM minhash_signatures s JOIN temp.batch_video_ids b ON b.video_id = s.video_id")}
+    videos = videos[~videos['video_id'].isin(indexed)].reset_index(drop=True)
+    if videos.empty:
+        return 0
+
+    signatures, has_tokens = minhash_signatures(videos)
+    videos, signatures = videos[has_tokens].reset_index(drop=True), signatures[has_tokens]
+    buckets = band_buckets(signatures)
+    video_ids = videos['video_id'].to_numpy(dtype=object)
+
+    # One row per (band, bucket, video), sorted so inserts append to the b-tree
+    bands = np.tile(np.arange(BANDS), len(videos))
+    bucket_keys = buckets.ravel()
+    members = np.repeat(video_ids, BANDS)
+    order = np.lexsort((members, bucket_keys, bands))
+    bands, bucket_keys, members = bands[order], bucket_keys[order], members[order]
+
+    conn.execute('''CREATE TEMP TABLE IF NOT EXISTS batch_buckets (
+        band INTEGER, bucket INTEGER, video_id TEXT)''')
+    conn.execute("DELETE FROM temp.batch_buckets")
+    conn.executemany("INSERT INTO temp.batch_buckets VALUES (?, ?, ?)",
+                     zip(bands.tolist(), bucket_keys.tolist(), members.tolist()))
+
+    # Candidates among already indexed videos: at most MAX_BUCKET_CANDIDATES
+    # members of each shared bucket, so very common buckets stay cheap
+    stored_pairs = conn.execute('''
+        SELECT DISTINCT b.video_id, l.video_id, s.signature, s.cluster_id
+        FROM temp.batch_buckets b
+        JOIN lsh_buckets l ON l.band = b.band AND l.bucket = b.bucket
+         AND l.video_id IN (
+             SELECT x.video_id FROM lsh_buckets x
+             WHERE x.band = b.band AND x.bucket = b.bucket
+             LIMIT ?
+         )
+        JOIN minhash_signatures s ON s.video_id = l.video_id
+    ''', (MAX_BUCKET_CANDIDATES,)).fetchall()
+
+    # Candidates inside the batch: link each bucket member to the first and to
+    # the previous member (linear in bucket size instead of all pairs)
+    same_bucket = (bands[1:] == bands[:-1]) & (bucket_keys[1:] == bucket_keys[:-1])
+    group_starts = np.flatnonzero(np.r_[True, ~same_bucket])
+    firsts = members[np.repeat(group_starts, np.diff(np.r_[group_starts, len(members)]))]
+    batch_pairs = pd.DataFrame({
+        'a': np.concatenate([firsts, members[:-1][same_bucket]]),
+        'b': np.concatenate([members, members[1:][same_bucket]])
+    })
+    batch_pairs = batch_pairs[batch_pairs['a'] != batch_pairs['b']].drop_duplicates()
+
+    position = {video_id: i for i, video_id in enumerate(video_ids)}
+    parent = {video_id: video_id for video_id in video_ids}
+    cluster_of = {}
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(a, b):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    # Confirm candidates by estimated Jaccard (share of equal MinHash values)
+    if stored_pairs:
+        new_ids, _, blobs, cluster_ids = zip(*stored_pairs)
+        stored_signatures = np.frombuffer(b''.join(blobs), dtype=np.uint32).reshape(len(blobs), NUM_PERMUTATIONS)
+        new_positions = np.array([position[video_id] for video_id in new_ids])
+        similar = (signatures[new_positions] == stored_signatures).mean(axis=1) >= threshold
+        for new_id, cluster_id in zip(np.array(new_ids)[similar], np.array(cluster_ids)[similar]):
+            cluster_of.setdefault(cluster_id, cluster_id)
+            parent.setdefault(cluster_id, cluster_id)
+            union(new_id, cluster_id)
+
+    if len(batch_pairs):
+        a = batch_pairs['a'].map(position).to_numpy()
+        b = batch_pairs['b'].map(position).to_numpy()
+        similar = (signatures[a] == signatures[b]).mean(axis=1) >= threshold
+        for i, j in zip(a[similar], b[similar]):
+            union(video_ids[i], video_ids[j])
+
+    # Existing clusters that a new video bridges are merged into the smallest id
+    for cluster_id in cluster_of:
+        root = find(cluster_id)
+        if root != cluster_id:
+            conn.execute("UPDATE minhash_signatures SET cluster_id = ? WHERE cluster_id = ?", (root, cluster_id))
+
+    roots = [find(video_id) for video_id in video_ids]
+    conn.executemany(
+        "INSERT INTO minhash_signatures (video_id, signature, cluster_id) VALUES (?, ?, ?)",
+        ((video_id, signatures[i].tobytes(), roots[i]) for i, video_id in enumerate(video_ids))
+    )
+    conn.execute("INSERT OR IGNORE INTO lsh_buckets SELECT band, bucket, video_id FROM temp.batch_buckets")
+
+    batch_sizes = Counter(roots)
+    existing_roots = {find(cluster_id) for cluster_id in cluster_of}
+    return sum(1 for root in roots if batch_sizes[root] > 1 or root in existing_roots)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index loaded videos for near-duplicate detection")
+    parser.add_argument('--rebuild', action='store_true', help="drop the index and rebuild it from all videos")
+    args = parser.parse_args()
+
+    conn = connect()
+
+    if args.rebuild:
+        conn.execute("DROP TABLE IF EXISTS lsh_buckets")
+        conn.execute("DROP TABLE IF EXISTS minhash_signatures")
+
+    videos = pd.read_sql_query("SELECT video_id, title, tags FROM videos", conn)
+    clustered = update_near_duplicates(videos, conn)
+    conn.commit()
+
+    clusters = conn.execute('''
+        SELECT cluster_id, COUNT(*) FROM minhash_signatures
+        GROUP BY cluster_id HAVING COUNT(*) > 1 ORDER BY COUNT(*) DESC
+    ''').fetchall()
+    print(f"Indexed {len(videos)} videos, {clustered} new near-duplicates")
+    print(f"Near-duplicate clusters: {len(clusters)}")
+    for cluster_id, size in clusters[:10]:
+        print(f"  {cluster_id}: {size} videos")
+    conn.close()
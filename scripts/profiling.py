@@ -0,0 +1,85 @@
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 1024 * 1024
+
+def current_rss_mb():
+    """Return the current resident set size in MB (None if unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / MB
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def max_rss_mb():
+    """Return the peak resident set size of the process in MB (None if unavailable)"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    if os.uname().sysname == 'Darwin':
+        return max_rss / MB
+    return max_rss / 1024
+
+class MemoryProfiler:
+    """Record peak traced memory and process RSS for each named step"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.steps = []
+        self._owns_tracing = False
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+
+    @contextmanager
+    def step(self, name):
+        """Measure the block as one step; a no-op when profiling is disabled"""
+        if not self.enabled:
+            yield
+            return
+
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            self.steps.append({
+                'step': name,
+                'seconds': round(time.perf_counter() - start, 4),
+                'peak_mb': round((peak - before) / MB, 2),
+                'net_mb': round((current - before) / MB, 2),
+                'rss_mb': _round(current_rss_mb()),
+                'max_rss_mb': _round(max_rss_mb())
+            })
+
+    def stop(self):
+        """Stop tracemalloc if this profiler started it"""
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+
+    def report(self):
+        """Print a per-step memory table"""
+        if not self.steps:
+            return
+        print(f"  {'Step':<22} {'Time (s)':>9} {'Peak MB':>9} {'Net MB':>9} {'RSS MB':>9} {'Max RSS':>9}")
+        for s in self.steps:
+            print(f"  {s['step']:<22} {s['seconds']:>9.3f} {s['peak_mb']:>9.2f} {s['net_mb']:>9.2f} "
+                  f"{_fmt(s['rss_mb']):>9} {_fmt(s['max_rss_mb']):>9}")
+
+def _round(value):
+    return None if value is None else round(value, 1)
+
+def _fmt(value):
+    return '-' if value is None else f"{value:.1f}"
@@ -0,0 +1,85 @@
+import pandas as pd
+
+RANK_COLUMNS = ['region_code', 'snapshot_at', 'chart_rank', 'video_id', 'view_count', 'prev_rank', 'rank_delta']
+
+# One row per chart position per (region, snapshot). rank_delta is positive when
+# a video climbed (prev_rank - chart_rank) and NULL for new entries.
+RANK_TABLES = [
+    '''CREATE TABLE IF NOT EXISTS chart_ranks (
+        region_code TEXT NOT NULL,
+        snapshot_at TEXT NOT NULL,
+        chart_rank INTEGER NOT NULL,
+        video_id TEXT NOT NULL,
+        view_count INTEGER,
+        prev_rank INTEGER,
+        rank_delta INTEGER,
+        PRIMARY KEY (region_code, snapshot_at, chart_rank)
+    ) WITHOUT ROWID''',
+    'CREATE INDEX IF NOT EXISTS idx_chart_ranks_video ON chart_ranks (video_id, region_code, snapshot_at)',
+    'CREATE INDEX IF NOT EXISTS idx_chart_ranks_delta ON chart_ranks (rank_delta)',
+    'CREATE INDEX IF NOT EXISTS idx_chart_ranks_rank ON chart_ranks (chart_rank, video_id, region_code)'
+]
+
+def batch_snapshots(df):
+    """Return the chart positions in df as (region_code, snapshot_at, chart_rank, video_id, view_count)"""
+    snapshots = pd.DataFrame({
+        'region_code': df['region_code'].astype(str).to_numpy(),
+        'snapshot_at': df['extracted_at'].astype(str).to_numpy(),
+        'chart_rank': df['chart_rank'].to_numpy(),
+        'video_id': df['video_id'].astype(str).to_numpy(),
+        'view_count': df['view_count'].to_numpy(dtype='int64')
+    })
+    return snapshots[snapshots['chart_rank'].notna()].astype({'chart_rank': 'int64'})
+
+def fetch_previous_chart(snapshots, conn):
+    """Return the latest stored chart before the batch for every region in snapshots"""
+    first = snapshots.groupby('region_code', sort=False)['snapshot_at'].min()
+    frames = []
+    for region_code, snapshot_at in first.items():
+        rows = conn.execute('''
+            SELECT region_code, snapshot_at, chart_rank, video_id
+            FROM chart_ranks
+            WHERE region_code = ?
+              AND snapshot_at = (
+                  SELECT MAX(snapshot_at) FROM chart_ranks
+                  WHERE region_code = ? AND snapshot_at < ?
+              )
+        ''', (region_code, region_code, snapshot_at)).fetchall()
+        frames.append(pd.DataFrame(rows, columns=['region_code', 'snapshot_at', 'chart_rank', 'video_id']))
+    if not frames:
+        return pd.DataFrame(columns=['region_code', 'snapshot_at', 'chart_rank', 'video_id'])
+    return pd.concat(frames, ignore_index=True)
+
+def compute_rank_changes(df, conn):
+    """Return chart_ranks rows for df with rank deltas against each region's previous snapshot"""
+    snapshots = batch_snapshots(df)
+    previous = fetch_previous_chart(snapshots, conn)
+
+    # Number each region's snapshots in order so the previous chart is seq - 1
+    combined = pd.concat([previous.assign(stored=True), snapshots.assign(stored=False)], ignore_index=True)
+    combined['seq'] = combined.groupby('region_code')['snapshot_at'].rank(method='dense').astype('int64')
+    prior = combined[['region_code', 'video_id', 'seq', 'chart_rank']].rename(columns={'chart_rank': 'prev_rank'})
+    prior['seq'] += 1
+
+    ranks = combined[~combined['stored'].astype(bool)].merge(prior, how='left', on=['region_code', 'video_id', 'seq'])
+    ranks['prev_rank'] = ranks['prev_rank'].astype('Int64')
+    ranks['rank_delta'] = ranks['prev_rank'] - ranks['chart_rank']
+    return ranks[RANK_COLUMNS]
+
+def update_chart_ranks(df, conn):
+    """Store the chart positions of df with their rank movement; returns rows written
+
+    The caller commits.
+    """
+    if 'chart_rank' not in df.columns:
+        return 0
+    for statement in RANK_TABLES:
+        conn.execute(statement)
+
+    ranks = compute_rank_changes(df, conn)
+    rows = ranks.astype(object).where(ranks.notna(), None).itertuples(index=False, name=None)
+    conn.executemany(f'''
+        INSERT OR REPLACE INTO chart_ranks ({', '.join(RANK_COLUMNS)})
+        VALUES ({', '.join('?' * len(RANK_COLUMNS))})
+    ''', rows)
+    return len(ranks)
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from transform import to_utc
+
+MAX_REGIONS = 63                # bits of a positive SQLite INTEGER
+
+# Each region gets a fixed bit; video_region_presence keeps one row per video
+# and day with the OR of the bits of every region it trended in that day.
+REGION_TABLES = [
+    '''CREATE TABLE IF NOT EXISTS regions (
+        region_code TEXT PRIMARY KEY,
+        bit INTEGER NOT NULL UNIQUE
+    )''',
+    '''CREATE TABLE IF NOT EXISTS video_region_presence (
+        video_id TEXT NOT NULL,
+        trending_date TEXT NOT NULL,
+        region_mask INTEGER NOT NULL,
+        region_count INTEGER NOT NULL,
+        PRIMARY KEY (video_id, trending_date)
+    ) WITHOUT ROWID''',
+    '''CREATE INDEX IF NOT EXISTS idx_region_presence_day
+        ON video_region_presence (trending_date, region_count)'''
+]
+
+def region_bits(region_codes, conn):
+    """Return {region_code: bit}, assigning the next free bits to unseen regions"""
+    bits = dict(conn.execute("SELECT region_code, bit FROM regions").fetchall())
+    next_bit = max(bits.values(), default=-1) + 1
+    for region_code in sorted(set(region_codes) - set(bits)):
+        if next_bit >= MAX_REGIONS:
+            raise ValueError(f"Cannot track more than {MAX_REGIONS} regions in a presence mask")
+        conn.execute("INSERT INTO regions (region_code, bit) VALUES (?, ?)", (region_code, next_bit))
+        bits[region_code] = next_bit
+        next_bit += 1
+    return bits
+
+def presence_masks(df, bits):
+    """Return one row per (video_id, trending_date) in df with its region_mask and region_count"""
+    presence = pd.DataFrame({
+        'video_id': df['video_id'].astype(str).to_numpy(),
+        'trending_date': to_utc(df['trending_date']).dt.strftime('%Y-%m-%d').to_numpy(),
+        'region_code': df['region_code'].astype(str).to_numpy()
+    }).dropna().drop_duplicates()
+
+    # Bits of distinct regions never overlap, so their sum is their OR
+    presence['region_mask'] = np.left_shift(1, presence['region_code'].map(bits).to_numpy(dtype='int64'))
+    masks = presence.groupby(['video_id', 'trending_date'], sort=False).agg(
+        region_mask=('region_mask', 'sum'), region_count=('region_code', 'size'))
+    return masks.reset_index()
+
+def update_region_presence(df, conn):
+    """Merge the regions of df into video_region_presence; returns (video, day) rows touched
+
+    Masks are OR-ed into stored rows, so loading regions in separate batches
+    accumulates. The caller commits.
+    """
+    for statement in REGION_TABLES:
+        conn.execute(statement)
+    conn.create_function('bit_count', 1, int.bit_count, deterministic=True)
+
+    bits = region_bits(df['region_code'].dropna().astype(str).unique(), conn)
+    masks = presence_masks(df, bits)
+    conn.executemany('''
+        INSERT INTO video_region_presence (video_id, trending_date, region_mask, region_count)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (video_id, trending_date) DO UPDATE SET
+            region_mask = region_mask | excluded.region_mask,
+            region_count = bit_count(region_mask | excluded.region_mask)
+    ''', zip(masks['video_id'].tolist(), masks['trending_date'].tolist(),
+             masks['region_mask'].tolist(), masks['region_count'].tolist()))
+    return len(masks)
@@ -0,0 +1,143 @@
+import argparse
+import os
+from datetime import datetime, timedelta, timezone
+
+from db import connect
+
+RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', 30))  # days of chart_ranks snapshots kept in full
+RETENTION_BATCH_ROWS = int(os.getenv('RETENTION_BATCH_ROWS', 20_000))  # snapshots rolled up per commit
+VACUUM_PAGES = int(os.getenv('RETENTION_VACUUM_PAGES', 10_000))  # free pages returned per incremental step
+
+# Snapshots older than the retention window, one row per video, region and
+# day: how many snapshots it was charted in, its view range and last views,
+# and its best (lowest) chart position.
+ROLLUP_TABLES = [
+    '''CREATE TABLE IF NOT EXISTS trending_daily (
+        video_id TEXT NOT NULL,
+        region_code TEXT NOT NULL,
+        trending_date TEXT NOT NULL,
+        snapshots INTEGER NOT NULL,
+        first_seen TEXT NOT NULL,
+        last_seen TEXT NOT NULL,
+        min_views INTEGER,
+        max_views INTEGER,
+        last_views INTEGER,
+        peak_rank INTEGER NOT NULL,
+        PRIMARY KEY (video_id, region_code, trending_date)
+    ) WITHOUT ROWID''',
+    'CREATE INDEX IF NOT EXISTS idx_trending_daily_date ON trending_daily (trending_date, region_code)'
+]
+
+# Merge a rollup into the stored row of the same day, so a day can be
+# rolled up over several batches or runs
+ROLLUP_MERGE = '''
+    ON CONFLICT (video_id, region_code, trending_date) DO UPDATE SET
+        snapshots = snapshots + excluded.snapshots,
+        first_seen = MIN(first_seen, excluded.first_seen),
+        last_seen = MAX(last_seen, excluded.last_seen),
+        min_views = MIN(min_views, excluded.min_views),
+        max_views = MAX(max_views, excluded.max_views),
+        last_views = CASE WHEN excluded.last_seen >= last_seen THEN excluded.last_views ELSE last_views END,
+        peak_rank = MIN(peak_rank, excluded.peak_rank)
+'''
+
+def retention_cutoff(days=None):
+    """Return the first day ('YYYY-MM-DD') whose snapshots are kept in full"""
+    days = RETENTION_DAYS if days is None else days
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d')
+
+def roll_up_batch(conn, region_code, cutoff, batch_rows):
+    """Roll up and delete the oldest batch_rows snapshots of region_code before cutoff; returns rows removed
+
+    Batches follow the chart_ranks primary key, so each is a range seek.
+    The caller commits.
+    """
+    end = conn.execute('''
+        SELECT snapshot_at, chart_rank FROM chart_ranks
+        WHERE region_code = ? AND snapshot_at < ?
+        ORDER BY snapshot_at, chart_rank LIMIT 1 OFFSET ?
+    ''', (region_code, cutoff, batch_rows - 1)).fetchone()
+    in_batch = "region_code = :region_code AND snapshot_at < :cutoff"
+    params = {'region_code': region_code, 'cutoff': cutoff}
+    if end:
+        in_batch += " AND (snapshot_at, chart_rank) <= (:end_at, :end_rank)"
+        params.update(end_at=end[0], end_rank=end[1])
+    conn.execute(f'''
+        INSERT INTO trending_daily (video_id, region_code, trending_date, snapshots, first_seen, last_seen,
+                                    min_views, max_views, last_views, peak_rank)
+        SELECT video_id, region_code, day, COUNT(*), MIN(snapshot_at), MAX(snapshot_at),
+               MIN(view_count), MAX(view_count), MAX(last_views), MIN(chart_rank)
+        FROM (
+            SELECT video_id, region_code, substr(snapshot_at, 1, 10) AS day, snapshot_at, view_count, chart_rank,
+                   LAST_VALUE(view_count) OVER (
+                       PARTITION BY video_id, substr(snapshot_at, 1, 10) ORDER BY snapshot_at
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS last_views
+            FROM chart_ranks WHERE {in_batch}
+        )
+        GROUP BY video_id, region_code, day
+        {ROLLUP_MERGE}
+    ''', params)
+    return conn.execute(f"DELETE FROM chart_ranks WHERE {in_batch}", params).rowcount
+
+def apply_retention(conn, days=None, batch_rows=None):
+    """Roll every chart_ranks snapshot older than the retention window into trending_daily
+
+    Deletes run in batches of batch_rows, each committed with its rollup,
+    so the write lock is held briefly and an interrupted run loses nothing.
+    Returns the snapshot rows removed.
+    """
+    batch_rows = batch_rows or RETENTION_BATCH_ROWS
+    cutoff = retention_cutoff(days)
+    for statement in ROLLUP_TABLES:
+        conn.execute(statement)
+    regions = [row[0] for row in conn.execute("SELECT DISTINCT region_code FROM chart_ranks")]
+    removed = 0
+    for region_code in regions:
+        while True:
+            deleted = roll_up_batch(conn, region_code, cutoff, batch_rows)
+            conn.commit()
+            removed += deleted
+            if deleted < batch_rows:
+                break
+    return removed
+
+def reclaim_space(conn, pages=None):
+    """Return free pages to the filesystem in steps of pages, then checkpoint and truncate the WAL
+
+    Needs auto_vacuum=INCREMENTAL (set on databases created by migrate(),
+    or once with --enable-incremental-vacuum); otherwise freed pages are
+    only reused. Returns the pages released.
+    """
+    pages = pages or VACUUM_PAGES
+    released = 0
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        while True:
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free:
+                break
+            # executescript steps the pragma to completion; execute() frees one page per call
+            conn.executescript(f"PRAGMA incremental_vacuum({pages})")
+            freed = free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not freed:
+                break
+            released += freed
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    return released
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roll old chart snapshots into daily rollups and reclaim their space")
+    parser.add_argument('--days', type=int, help=f"days of snapshots kept in full (default {RETENTION_DAYS})")
+    parser.add_argument('--batch-rows', type=int, help="snapshots rolled up and deleted per commit")
+    parser.add_argument('--vacuum-pages', type=int, help="free pages released per incremental vacuum step")
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help="switch an existing database to auto_vacuum=INCREMENTAL (runs a full VACUUM once)")
+    args = parser.parse_args()
+
+    conn = connect()
+    if args.enable_incremental_vacuum:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    print(f"Rolled up {apply_retention(conn, args.days, args.batch_rows)} snapshots "
+          f"from before {retention_cutoff(args.days)}")
+    print(f"Released {reclaim_space(conn, args.vacuum_pages)} free pages")
+    conn.close()
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+# Arrow-backed strings are several times smaller than object columns; fall
+# back to pandas' own string dtype when pyarrow is not installed
+try:
+    import pyarrow  # noqa: F401
+    TEXT = pd.StringDtype('pyarrow')
+except ImportError:
+    TEXT = pd.StringDtype('python')
+
+CATEGORY = 'category'
+
+# Columns shared by every stage, keyed by column name
+RAW_SCHEMA = {
+    'video_id': TEXT,
+    'title': TEXT,
+    'channel_name': TEXT,
+    'channel_id': CATEGORY,
+    'published_at': TEXT,
+    'category_id': CATEGORY,
+    'tags': TEXT,
+    'view_count': 'uint64',
+    'like_count': 'uint32',
+    'comment_count': 'uint32',
+    'duration': CATEGORY,
+    'region_code': CATEGORY,
+    'chart_rank': 'UInt16',
+    'trending_date': CATEGORY,
+    'extracted_at': CATEGORY
+}
+
+# Columns added by transform_data
+DERIVED_SCHEMA = {
+    'duration_minutes': 'float32',
+    'engagement_rate': 'float32',
+    'like_rate': 'float32',
+    'comment_rate': 'float32',
+    'days_to_trend': 'Int32'
+}
+
+# Columns added by velocity.add_velocity (deltas can be negative)
+VELOCITY_SCHEMA = {
+    'hours_since_prev': 'float64',
+    'view_delta': 'Int64',
+    'like_delta': 'Int64',
+    'comment_delta': 'Int64',
+    'view_velocity': 'float64',
+    'like_velocity': 'float64',
+    'comment_velocity': 'float64'
+}
+
+TRANSFORMED_SCHEMA = {**RAW_SCHEMA, **DERIVED_SCHEMA, **VELOCITY_SCHEMA}
+
+COUNT_COLUMNS = ['view_count', 'like_count', 'comment_count']
+
+# Rounding applied in transform_data, restored when float32 columns are widened
+STORAGE_DECIMALS = {
+    'duration_minutes': 2,
+    'engagement_rate': 4,
+    'like_rate': 4,
+    'comment_rate': 4
+}
+
+def apply_schema(df, schema=TRANSFORMED_SCHEMA):
+    """Cast the columns of df that appear in schema to their compact dtypes (in place)
+
+    Datetime columns are left alone, so the schema can be applied to frames
+    in the middle of transform_data. Missing counts become 0, and counts that
+    do not fit an unsigned type stay int64 so bad values are never wrapped.
+    """
+    for column, dtype in schema.items():
+        if column not in df.columns:
+            continue
+        series = df[column]
+        if pd.api.types.is_datetime64_any_dtype(series.dtype) or series.dtype == dtype:
+            continue
+        if column in COUNT_COLUMNS:
+            series = series.fillna(0)
+            if (series < 0).any() or series.max() > np.iinfo(dtype).max:
+                df[column] = series.astype('int64')
+                continue
+        df[column] = series.astype(dtype)
+    return df
+
+def read_csv(path, schema=TRANSFORMED_SCHEMA, **kwargs):
+    """Read a pipeline CSV straight into the compact schema"""
+    # Strings and categoricals can be parsed directly; numeric columns are
+    # cast afterwards because missing values would fail an integer parse
+    dtypes = {
+        column: dtype for column, dtype in schema.items()
+        if dtype == CATEGORY or isinstance(dtype, pd.StringDtype)
+    }
+    df = pd.read_csv(path, dtype=dtypes, **kwargs)
+    return apply_schema(df, schema)
+
+def to_storage(df):
+    """Return df with compact dtypes widened to types the database drivers can bind
+
+    float32 columns go back to float64 (rounded, so 87.22 is not written as
+    87.22000122) and nullable integers become objects with None for missing.
+    """
+    converted = {}
+    for column in df.columns:
+        series = df[column]
+        if series.dtype == 'float32':
+            converted[column] = series.astype('float64').round(STORAGE_DECIMALS.get(column, 6))
+        elif isinstance(series.dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(series.dtype):
+            converted[column] = series.astype(object).where(series.notna(), None)
+    return df.assign(**converted) if converted else df
+
+def memory_usage_mb(df):
+    """Return the deep memory usage of df in MB"""
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
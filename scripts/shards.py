@@ -0,0 +1,211 @@
+import argparse
+import os
+import re
+import sqlite3
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from db import connect, read_only_uri
+from transform import to_utc
+
+OPEN_MONTHS = int(os.getenv('SHARD_OPEN_MONTHS', 2))  # newest months kept in the main database
+ARCHIVE_BATCH_ROWS = int(os.getenv('SHARD_BATCH_ROWS', 50_000))  # rows per committed copy into a shard
+
+# Closed months of trending_data live in one read-only file per month
+# (trending_YYYY_MM.db in the shard directory); this registry lists them.
+SHARD_TABLES = [
+    '''CREATE TABLE IF NOT EXISTS trending_shards (
+        month TEXT PRIMARY KEY,
+        file_name TEXT NOT NULL,
+        row_count INTEGER NOT NULL,
+        archived_at TEXT NOT NULL
+    )'''
+]
+
+def shard_dir(conn):
+    """Return the directory of the shard files: TRENDING_SHARD_DIR, or trending_shards next to the database"""
+    main_path = next(row[2] for row in conn.execute("PRAGMA database_list") if row[1] == 'main')
+    return os.getenv('TRENDING_SHARD_DIR', os.path.join(os.path.dirname(main_path), 'trending_shards'))
+
+def month_bounds(month):
+    """Return the first day of month ('YYYY-MM') and of the month after, as trending_date prefixes"""
+    year, number = (int(part) for part in month.split('-'))
+    year, number = (year + 1, 1) if number == 12 else (year, number + 1)
+    return f'{month}-01', f'{year:04d}-{number:02d}-01'
+
+def archived_months(conn):
+    """Return the archived months, oldest first; empty if the registry does not exist yet"""
+    exists = conn.execute("SELECT 1 FROM main.sqlite_master WHERE name = 'trending_shards'").fetchone()
+    if not exists:
+        return []
+    return [row[0] for row in conn.execute("SELECT month FROM main.trending_shards ORDER BY month")]
+
+def drop_archived(df, conn):
+    """Return the rows of df whose trending_date is not in an archived month
+
+    Archived months are read-only, so a late snapshot for one cannot be
+    loaded without duplicating its key across files.
+    """
+    months = archived_months(conn)
+    if not months or df.empty:
+        return df
+    open_from = pd.Timestamp(month_bounds(months[-1])[1], tz='UTC')
+    return df[~(to_utc(df['trending_date']) < open_from).to_numpy()]
+
+def shard_path(conn, month):
+    """Return the path of the shard file of an archived month"""
+    file_name = conn.execute("SELECT file_name FROM main.trending_shards WHERE month = ?", (month,)).fetchone()[0]
+    return os.path.join(shard_dir(conn), file_name)
+
+def each_month_schema(conn):
+    """Yield the schema holding each part of trending_data, oldest first: every archived month, then main
+
+    Each shard is attached as 'shard' only while its month is being read,
+    so any number of archived months can be read, unlike attach_shards.
+    """
+    for month in archived_months(conn):
+        conn.execute("ATTACH DATABASE ? AS shard", (read_only_uri(shard_path(conn, month)),))
+        try:
+            yield 'shard'
+        finally:
+            conn.execute("DETACH DATABASE shard")
+    yield 'main'
+
+def _columns(conn, schema):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info(trending_data)")]
+
+def attach_shards(conn, start=None, end=None):
+    """Attach the shards of the months in [start, end] and put them behind a trending_data view
+
+    start and end are dates ('YYYY-MM-DD' or 'YYYY-MM'); months outside
+    them are not attached, which is the shard pruning. The TEMP view
+    trending_data (main's rows UNION ALL each shard's) shadows
+    main.trending_data for unqualified names on this connection, so reads
+    see every month unchanged while loaders keep writing to main. A shard
+    created before a later column was added reads it as NULL. Returns the
+    attached months.
+    """
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    months = [month for month in archived_months(conn)
+              if (start is None or month >= start[:7]) and (end is None or month <= end[:7])]
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) - (len(attached) - 2)
+    if len(months) > limit:
+        raise ValueError(f"{len(months)} monthly shards in range but only {limit} can be attached; "
+                         "narrow the start and end dates")
+    for month in months:
+        schema = f"trending_{month.replace('-', '_')}"
+        if schema not in attached:
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", (read_only_uri(shard_path(conn, month)),))
+
+    conn.execute("DROP VIEW IF EXISTS temp.trending_data")
+    if months:
+        columns = _columns(conn, 'main')
+        selects = [f"SELECT {', '.join(columns)} FROM main.trending_data"]
+        for month in months:
+            schema = f"trending_{month.replace('-', '_')}"
+            present = set(_columns(conn, schema))
+            selects.append(f"SELECT {', '.join(c if c in present else f'NULL AS {c}' for c in columns)} "
+                           f"FROM {schema}.trending_data")
+        conn.execute(f"CREATE TEMP VIEW trending_data AS {' UNION ALL '.join(selects)}")
+    return months
+
+def create_shard_schema(conn, schema):
+    """Create trending_data and its indexes in the attached schema, as they are in main"""
+    objects = conn.execute('''
+        SELECT type, sql FROM main.sqlite_master
+        WHERE tbl_name = 'trending_data' AND sql IS NOT NULL ORDER BY type = 'index'
+    ''').fetchall()
+    for kind, sql in objects:
+        if kind == 'table':
+            sql = re.sub(r'^CREATE TABLE "?trending_data"?', f'CREATE TABLE IF NOT EXISTS {schema}.trending_data', sql)
+        else:
+            sql = re.sub(r'^CREATE (UNIQUE )?INDEX (\w+)', rf'CREATE \1INDEX IF NOT EXISTS {schema}.\2', sql)
+        conn.execute(sql)
+
+def archive_month(conn, month, batch_rows=None):
+    """Move one month of trending_data into its shard file, then make the file read-only
+
+    Rows are copied in id ranges of batch_rows, each committed on its own,
+    so an interrupted archive is finished by rerunning it. Once the shard
+    holds every row, the month leaves main and enters the registry in one
+    transaction: readers of the view never see it twice or not at all.
+    Returns the rows moved.
+    """
+    batch_rows = batch_rows or ARCHIVE_BATCH_ROWS
+    first_day, next_month = month_bounds(month)
+    directory = shard_dir(conn)
+    os.makedirs(directory, exist_ok=True)
+    file_name = f"trending_{month.replace('-', '_')}.db"
+    path = os.path.join(directory, file_name)
+    in_month = "trending_date >= :first_day AND trending_date < :next_month"
+    bounds = {'first_day': first_day, 'next_month': next_month}
+
+    conn.execute("ATTACH DATABASE ? AS shard", (path,))
+    try:
+        create_shard_schema(conn, 'shard')
+        columns = ', '.join(_columns(conn, 'main'))
+        min_id, max_id = conn.execute(f"SELECT MIN(id), MAX(id) FROM main.trending_data WHERE {in_month}",
+                                      bounds).fetchone()
+        for start in range(min_id or 0, (max_id or -1) + 1, batch_rows):
+            conn.execute(f'''
+                INSERT OR IGNORE INTO shard.trending_data ({columns})
+                SELECT {columns} FROM main.trending_data
+                WHERE id BETWEEN :start AND :end AND {in_month}
+            ''', {**bounds, 'start': start, 'end': start + batch_rows - 1})
+            conn.commit()
+
+        copied = conn.execute("SELECT COUNT(*) FROM shard.trending_data").fetchone()[0]
+        missing = conn.execute(f'''
+            SELECT COUNT(*) FROM main.trending_data m
+            WHERE {in_month} AND NOT EXISTS (SELECT 1 FROM shard.trending_data s WHERE s.id = m.id)
+        ''', bounds).fetchone()[0]
+        if missing:
+            raise RuntimeError(f"{missing} rows of {month} were not copied to {path}; main is unchanged")
+
+        conn.execute("ANALYZE shard")
+        conn.execute(f"DELETE FROM main.trending_data WHERE {in_month}", bounds)
+        conn.execute("INSERT OR REPLACE INTO trending_shards VALUES (?, ?, ?, ?)",
+                     (month, file_name, copied, datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')))
+        conn.commit()
+    finally:
+        conn.rollback()
+        conn.execute("DETACH DATABASE shard")
+
+    # Compact the closed month into a standalone file and stop writes to it
+    shard = sqlite3.connect(path)
+    shard.execute("PRAGMA journal_mode = DELETE")
+    shard.execute("VACUUM")
+    shard.close()
+    os.chmod(path, 0o444)
+    return copied
+
+def months_to_archive(conn, open_months=None):
+    """Return the months of main.trending_data older than the newest open_months (OPEN_MONTHS)"""
+    open_months = OPEN_MONTHS if open_months is None else open_months
+    today = datetime.now(timezone.utc)
+    index = today.year * 12 + today.month - 1 - (open_months - 1)
+    cutoff = f'{index // 12:04d}-{index % 12 + 1:02d}-01'
+    archived = set(archived_months(conn))
+    rows = conn.execute('''
+        SELECT DISTINCT substr(trending_date, 1, 7) FROM main.trending_data
+        WHERE trending_date < ? ORDER BY 1
+    ''', (cutoff,)).fetchall()
+    return [month for (month,) in rows if month not in archived]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move closed months of trending_data into monthly shard files")
+    parser.add_argument('--open-months', type=int, help="newest months to keep in the main database")
+    parser.add_argument('--batch-rows', type=int, help="rows per committed copy into a shard")
+    parser.add_argument('--status', action='store_true', help="only list the archived shards")
+    args = parser.parse_args()
+
+    conn = connect()
+    for statement in SHARD_TABLES:
+        conn.execute(statement)
+    if not args.status:
+        for month in months_to_archive(conn, args.open_months):
+            print(f"Archived {archive_month(conn, month, args.batch_rows)} snapshots of {month}")
+    for month, file_name, row_count in conn.execute("SELECT month, file_name, row_count FROM trending_shards"):
+        print(f"  {month}: {row_count} snapshots in {os.path.join(shard_dir(conn), file_name)}")
+    conn.close()
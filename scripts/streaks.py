@@ -0,0 +1,154 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from db import connect
+from shards import each_month_schema
+from transform import to_utc
+
+STREAK_KEY = ['video_id', 'region_code']
+STREAK_COLUMNS = ['video_id', 'region_code', 'streak_start', 'last_seen', 'days']
+
+# One row per run of consecutive trending days of a video in a region. The
+# open streak of a video is its latest streak_start, found by a PK seek.
+STREAK_TABLES = [
+    '''CREATE TABLE IF NOT EXISTS trending_streaks (
+        video_id TEXT NOT NULL,
+        region_code TEXT NOT NULL,
+        streak_start TEXT NOT NULL,
+        last_seen TEXT NOT NULL,
+        days INTEGER NOT NULL,
+        PRIMARY KEY (video_id, region_code, streak_start)
+    ) WITHOUT ROWID''',
+    'CREATE INDEX IF NOT EXISTS idx_streaks_last_seen ON trending_streaks (region_code, last_seen)',
+    'CREATE INDEX IF NOT EXISTS idx_streaks_days ON trending_streaks (days)'
+]
+
+def batch_days(df):
+    """Return the distinct (video_id, region_code, day) of df, day as datetime64[D]"""
+    days = pd.DataFrame({
+        'video_id': df['video_id'].astype(str).to_numpy(),
+        'region_code': df['region_code'].astype(str).to_numpy(),
+        'day': to_utc(df['trending_date']).dt.tz_localize(None).to_numpy(dtype='datetime64[D]')
+    })
+    return days[~np.isnat(days['day'].to_numpy())].drop_duplicates()
+
+def fetch_open_streaks(days, conn):
+    """Return the latest stored streak of every (video_id, region_code) in days"""
+    conn.execute('''CREATE TEMP TABLE IF NOT EXISTS batch_streak_keys (
+        video_id TEXT NOT NULL,
+        region_code TEXT NOT NULL,
+        PRIMARY KEY (video_id, region_code)
+    )''')
+    conn.execute("DELETE FROM temp.batch_streak_keys")
+    keys = days[STREAK_KEY].drop_duplicates()
+    conn.executemany("INSERT INTO temp.batch_streak_keys VALUES (?, ?)",
+                     zip(keys['video_id'].tolist(), keys['region_code'].tolist()))
+    rows = conn.execute('''
+        SELECT s.video_id, s.region_code, s.streak_start, s.last_seen, s.days
+        FROM temp.batch_streak_keys b
+        JOIN trending_streaks s ON s.video_id = b.video_id
+         AND s.region_code = b.region_code
+         AND s.streak_start = (
+             SELECT MAX(p.streak_start) FROM trending_streaks p
+             WHERE p.video_id = b.video_id AND p.region_code = b.region_code
+         )
+    ''').fetchall()
+    return pd.DataFrame(rows, columns=STREAK_COLUMNS)
+
+def compute_streaks(days, open_streaks):
+    """Return the streak rows to write for the batch days (gaps-and-islands)
+
+    Days already covered by the open streak are ignored. The first run of
+    a video continues its open streak when it starts the day after last_seen.
+    """
+    stored = open_streaks.assign(
+        streak_start=open_streaks['streak_start'].to_numpy(dtype='datetime64[D]'),
+        last_seen=open_streaks['last_seen'].to_numpy(dtype='datetime64[D]'))
+    days = days.merge(stored, how='left', on=STREAK_KEY)
+    days = days[days['last_seen'].isna() | (days['day'] > days['last_seen'])]
+    if days.empty:
+        return pd.DataFrame(columns=STREAK_COLUMNS)
+    days = days.sort_values(STREAK_KEY + ['day'], kind='stable')
+
+    # A new island starts at every new key or gap of more than one day
+    day = days['day'].to_numpy()
+    same_key = np.r_[False, (days['video_id'].to_numpy()[1:] == days['video_id'].to_numpy()[:-1]) &
+                     (days['region_code'].to_numpy()[1:] == days['region_code'].to_numpy()[:-1])]
+    gap = np.r_[np.timedelta64(0, 'D'), np.diff(day)]
+    days = days.assign(island=np.cumsum(~(same_key & (gap == np.timedelta64(1, 'D')))))
+
+    islands = days.groupby('island', sort=False).agg(
+        video_id=('video_id', 'first'), region_code=('region_code', 'first'),
+        first_day=('day', 'min'), last_day=('day', 'max'),
+        open_start=('streak_start', 'first'), open_last=('last_seen', 'first'))
+    continues = (islands['first_day'] - islands['open_last']).to_numpy() == np.timedelta64(1, 'D')
+    streak_start = np.where(continues, islands['open_start'].to_numpy(), islands['first_day'].to_numpy())
+
+    streaks = pd.DataFrame({
+        'video_id': islands['video_id'].to_numpy(),
+        'region_code': islands['region_code'].to_numpy(),
+        'streak_start': streak_start.astype('datetime64[D]'),
+        'last_seen': islands['last_day'].to_numpy(dtype='datetime64[D]')
+    })
+    streaks['days'] = (streaks['last_seen'] - streaks['streak_start']).dt.days + 1
+    for column in ('streak_start', 'last_seen'):
+        streaks[column] = streaks[column].dt.strftime('%Y-%m-%d')
+    return streaks[STREAK_COLUMNS]
+
+def update_trending_streaks(df, conn):
+    """Extend or open trending streaks for the videos in df; returns streak rows written
+
+    Only the (video_id, region_code) pairs in df are read or written. The
+    caller commits.
+    """
+    for statement in STREAK_TABLES:
+        conn.execute(statement)
+    days = batch_days(df)
+    if days.empty:
+        return 0
+    streaks = compute_streaks(days, fetch_open_streaks(days, conn))
+    conn.executemany(f'''
+        INSERT OR REPLACE INTO trending_streaks ({', '.join(STREAK_COLUMNS)})
+        VALUES ({', '.join('?' * len(STREAK_COLUMNS))})
+    ''', zip(*(streaks[column].tolist() for column in STREAK_COLUMNS)))
+    return len(streaks)
+
+def rebuild(conn):
+    """Recompute every streak from trending_data and its monthly shards; returns (streaks, snapshots)
+
+    Months are read one at a time, oldest first, so a streak running across
+    a month boundary is extended like one spanning two loads. Each month is
+    committed before its shard is detached, which SQLite refuses to do
+    inside the transaction that read it.
+    """
+    conn.execute("DROP TABLE IF EXISTS trending_streaks")
+    snapshots = 0
+    for schema in each_month_schema(conn):
+        history = pd.read_sql_query(f"SELECT video_id, region_code, trending_date FROM {schema}.trending_data", conn)
+        update_trending_streaks(history, conn)
+        conn.commit()
+        snapshots += len(history)
+    streaks = conn.execute("SELECT COUNT(*) FROM trending_streaks").fetchone()[0]
+    return streaks, snapshots
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain trending_streaks")
+    parser.add_argument('--rebuild', action='store_true', help="recompute every streak from trending_data and its shards")
+    args = parser.parse_args()
+
+    conn = connect()
+
+    if args.rebuild:
+        streaks, snapshots = rebuild(conn)
+        print(f"Rebuilt {streaks} streaks from {snapshots} snapshots")
+
+    longest = conn.execute('''
+        SELECT video_id, region_code, streak_start, last_seen, days
+        FROM trending_streaks ORDER BY days DESC LIMIT 10
+    ''').fetchall()
+    print("Longest trending streaks:")
+    for video_id, region_code, streak_start, last_seen, days in longest:
+        print(f"  {video_id} ({region_code}): {days} days, {streak_start} to {last_seen}")
+    conn.close()
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+def explode_tags(df):
+    """Split the comma-joined tags column into a tag dictionary and a video->tag bridge
+
+    Returns (tags_df, video_tags_df). tags_df has one row per distinct tag
+    (trimmed and lower-cased) with a batch-local tag_id; video_tags_df links
+    each video_id to those ids. Loaders map the local ids to database ids.
+    """
+    videos = df[['video_id', 'tags']].drop_duplicates(subset=['video_id'])
+    exploded = (
+        videos.assign(tag=videos['tags'].astype(object).str.split(','))
+        .explode('tag')
+    )
+    tag = exploded['tag'].str.strip().str.lower()
+    keep = tag.notna() & (tag != '')
+    pairs = pd.DataFrame({
+        'video_id': exploded['video_id'].to_numpy()[keep.to_numpy()],
+        'tag': tag[keep].to_numpy()
+    }).drop_duplicates()
+
+    codes, uniques = pd.factorize(pairs['tag'])
+    tags_df = pd.DataFrame({'tag_id': np.arange(len(uniques), dtype='int64'), 'tag': uniques})
+    video_tags_df = pd.DataFrame({'video_id': pairs['video_id'].to_numpy(), 'tag_id': codes.astype('int64')})
+    return tags_df, video_tags_df
+
+def remap_tag_ids(video_tags_df, tags_df, database_ids):
+    """Replace batch-local tag ids with database ids
+
+    database_ids maps tag text to its id in the database.
+    """
+    local_to_database = tags_df['tag'].map(database_ids).to_numpy(dtype='int64')
+    return video_tags_df.assign(tag_id=local_to_database[video_tags_df['tag_id'].to_numpy()])
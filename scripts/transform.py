@@ -1,7 +1,12 @@
 import pandas as pd
 import re
-from datetime import datetime
 import os
+import argparse
+
+from profiling import MemoryProfiler
+from schema import RAW_SCHEMA, TRANSFORMED_SCHEMA, apply_schema, read_csv
+from ledger import ProcessedLedger, read_snapshot
+from validate import validate_data, write_quarantine
 
 def clean_text(text):
     """Remove special characters and clean text"""
@@ -37,59 +42,161 @@ def parse_duration(duration):
     except:
         return 0
 
+def to_utc(series):
+    """pd.to_datetime(utc=True) that parses each distinct categorical value only once
+
+    Unparseable values become NaT so validate.py can quarantine those rows.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = pd.to_datetime(series.cat.categories, utc=True, errors='coerce')
+        values = categories.take(series.cat.codes.to_numpy(), allow_fill=True, fill_value=pd.NaT)
+        return pd.Series(values, index=series.index, name=series.name)
+    return pd.to_datetime(series, utc=True, errors='coerce')
+
 def calculate_engagement_rate(row):
     """Calculate engagement rate"""
     if row['view_count'] == 0:
         return 0
     return round(((row['like_count'] + row['comment_count']) / row['view_count']) * 100, 4)
 
-def transform_data(df):
-    """Apply all transformations"""
-    df_clean = df.copy()
+ENGINES = ('pandas', 'polars')
+
+def _clean_text(df):
+    print("- Cleaning text fields...")
+    df['title'] = df['title'].apply(clean_text)
+    df['channel_name'] = df['channel_name'].apply(clean_text)
+
+def _duration_minutes(df):
+    print("- Parsing video durations...")
+    df['duration_minutes'] = df['duration'].apply(parse_duration)
+
+def _engagement_rate(df):
+    print("- Calculating engagement metrics...")
+    df['engagement_rate'] = df.apply(calculate_engagement_rate, axis=1)
+
+def _like_rate(df):
+    df['like_rate'] = round((df['like_count'] / df['view_count'] * 100).fillna(0), 4)
+
+def _comment_rate(df):
+    df['comment_rate'] = round((df['comment_count'] / df['view_count'] * 100).fillna(0), 4)
+
+def _convert_dates(df):
+    # FIX: Make both timezone-aware
+    print("- Converting date formats...")
+    df['published_at'] = to_utc(df['published_at'])
+    df['trending_date'] = to_utc(df['trending_date'])
+
+def _days_to_trend(df):
+    df['days_to_trend'] = (df['trending_date'] - df['published_at']).dt.days
+
+# Column producers in run order: step name -> (columns produced, steps it
+# needs first, function). Columns no step produces pass through unchanged.
+COLUMN_PRODUCERS = {
+    'clean_text': (['title', 'channel_name'], [], _clean_text),
+    'parse_duration': (['duration_minutes'], [], _duration_minutes),
+    'engagement_rate': (['engagement_rate'], [], _engagement_rate),
+    'like_rate': (['like_rate'], [], _like_rate),
+    'comment_rate': (['comment_rate'], [], _comment_rate),
+    'convert_dates': (['published_at', 'trending_date'], [], _convert_dates),
+    'days_to_trend': (['days_to_trend'], ['convert_dates'], _days_to_trend)
+}
+
+# Deduplication compares parsed trending dates, so dates are always converted
+ALWAYS_RUN = ['convert_dates']
+
+def plan_producers(columns=None):
+    """Return the producer steps needed for columns (all of them for None), in run order"""
+    if columns is None:
+        return list(COLUMN_PRODUCERS)
+    producer_of = {column: step for step, (produced, _, _) in COLUMN_PRODUCERS.items() for column in produced}
+    unknown = [column for column in columns if column not in producer_of and column not in RAW_SCHEMA]
+    if unknown:
+        raise ValueError(f"Unknown transform output columns: {unknown}")
+
+    needed = set()
+    pending = ALWAYS_RUN + [producer_of[column] for column in columns if column in producer_of]
+    while pending:
+        step = pending.pop()
+        if step not in needed:
+            needed.add(step)
+            pending.extend(COLUMN_PRODUCERS[step][1])
+    return [step for step in COLUMN_PRODUCERS if step in needed]
+
+def transform_data(df, inplace=False, profile_memory=False, engine='pandas', columns=None):
+    """Apply all transformations
+
+    inplace=True transforms the given frame directly instead of working on a
+    copy, so the input must not be reused afterwards. profile_memory=True
+    prints peak memory per step and stores it in attrs['memory_profile'].
+    engine='polars' runs the same steps on the multi-threaded polars lazy
+    engine (see transform_polars.py); inplace has no effect there.
+    columns limits the output to those columns and runs only the producers
+    they depend on (see COLUMN_PRODUCERS); None returns every column.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown transform engine '{engine}', expected one of {ENGINES}")
+    steps = plan_producers(columns)
+    if engine == 'polars':
+        from transform_polars import transform_data_polars
+        return transform_data_polars(df, profile_memory=profile_memory, columns=columns)
     
-    print("Applying transformations...")
+    profiler = MemoryProfiler(enabled=profile_memory)
     
-    # Clean text fields
-    print("- Cleaning text fields...")
-    df_clean['title'] = df_clean['title'].apply(clean_text)
-    df_clean['channel_name'] = df_clean['channel_name'].apply(clean_text)
+    with profiler.step('copy'):
+        df_clean = df if inplace else df.copy()
     
-    # Parse duration
-    print("- Parsing video durations...")
-    df_clean['duration_minutes'] = df_clean['duration'].apply(parse_duration)
+    with profiler.step('apply_schema'):
+        apply_schema(df_clean, RAW_SCHEMA)
     
-    # Calculate metrics
-    print("- Calculating engagement metrics...")
-    df_clean['engagement_rate'] = df_clean.apply(calculate_engagement_rate, axis=1)
-    df_clean['like_rate'] = round((df_clean['like_count'] / df_clean['view_count'] * 100).fillna(0), 4)
-    df_clean['comment_rate'] = round((df_clean['comment_count'] / df_clean['view_count'] * 100).fillna(0), 4)
+    print("Applying transformations...")
     
-    # Convert dates (FIX: Make both timezone-aware)
-    print("- Converting date formats...")
-    df_clean['published_at'] = pd.to_datetime(df_clean['published_at'], utc=True)
-    df_clean['trending_date'] = pd.to_datetime(df_clean['trending_date'], utc=True)
+    # Run the column producers the requested columns depend on
+    for step in steps:
+        with profiler.step(step):
+            COLUMN_PRODUCERS[step][2](df_clean)
     
-    # Calculate days to trend
-    df_clean['days_to_trend'] = (df_clean['trending_date'] - df_clean['published_at']).dt.days
+    # Handle missing values (column by column, so untouched columns are not copied)
+    with profiler.step('fill_missing'):
+        for column, value in (('like_count', 0), ('comment_count', 0), ('tags', '')):
+            if df_clean[column].isna().any():
+                df_clean[column] = df_clean[column].fillna(value)
     
-    # Remove duplicates
+    # Remove duplicates (only materializes a new frame when there are any)
     print("- Removing duplicates...")
-    original_count = len(df_clean)
-    df_clean = df_clean.drop_duplicates(subset=['video_id', 'trending_date'])
-    duplicates_removed = original_count - len(df_clean)
+    with profiler.step('drop_duplicates'):
+        duplicated = df_clean.duplicated(subset=['video_id', 'trending_date'])
+        duplicates_removed = int(duplicated.sum())
+        if duplicates_removed:
+            df_clean = df_clean[~duplicated]
     print(f"  Removed {duplicates_removed} duplicate records")
     
-    # Handle missing values
-    df_clean = df_clean.fillna({
-        'like_count': 0,
-        'comment_count': 0,
-        'tags': ''
-    })
+    if columns is not None:
+        df_clean = df_clean[list(columns)]
+    
+    # Store derived columns in their compact dtypes
+    with profiler.step('compact_dtypes'):
+        apply_schema(df_clean, TRANSFORMED_SCHEMA)
+    
+    if profile_memory:
+        profiler.stop()
+        print("- Peak memory per step:")
+        profiler.report()
+        df_clean.attrs['memory_profile'] = profiler.steps
     
     return df_clean
 
 # Test
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transform every unprocessed raw YouTube extract")
+    parser.add_argument('--inplace', action='store_true', help="transform without copying the raw frame")
+    parser.add_argument('--profile-memory', action='store_true', help="report peak memory per transform step")
+    parser.add_argument('--engine', choices=ENGINES, default='pandas', help="transform engine to use")
+    parser.add_argument('--reprocess', action='store_true',
+                        help="transform every raw file, including ones the ledger marks as processed")
+    parser.add_argument('--skip-loaded', action='store_true',
+                        help="drop rows whose snapshot key is already in the database")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("YOUTUBE DATA TRANSFORMATION")
     print("=" * 60)
@@ -104,46 +211,86 @@ if __name__ == "__main__":
     if not os.path.exists(transformed_dir):
         os.makedirs(transformed_dir)
     
-    # Get the most recent raw file
-    raw_files = [f for f in os.listdir(raw_dir) if f.endswith('.csv')]
+    # Pick up every raw file the ledger has not seen (or that changed since)
+    raw_files = sorted(f for f in os.listdir(raw_dir) if f.endswith('.csv'))
     
     if not raw_files:
         print("❌ No raw data files found in data/raw/")
         print("   Run extract.py first!")
         exit()
     
-    # Sort by filename (which includes timestamp) and get the latest
-    latest_file = sorted(raw_files)[-1]
-    input_path = os.path.join(raw_dir, latest_file)
+    ledger = ProcessedLedger.load()
+    raw_paths = [os.path.join(raw_dir, f) for f in raw_files]
+    input_paths = raw_paths if args.reprocess else ledger.unprocessed(raw_paths)
     
-    print(f"\nInput file: {latest_file}")
-    print(f"Full path: {input_path}")
-    
-    # Read raw data
-    print("\nReading raw data...")
-    df_raw = pd.read_csv(input_path)
-    print(f"✓ Loaded {len(df_raw)} records")
+    if not input_paths:
+        print(f"\n✓ All {len(raw_files)} raw files already processed (use --reprocess to redo them)")
+        exit()
     
-    # Transform
-    print()
-    df_transformed = transform_data(df_raw)
+    print(f"\nInput files: {len(input_paths)} of {len(raw_files)} raw files")
+    for input_path in input_paths:
+        print(f"  {os.path.basename(input_path)}")
     
-    # Save transformed data
-    output_filename = f'youtube_transformed_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-    output_path = os.path.join(transformed_dir, output_filename)
+    conn = None
+    if args.skip_loaded:
+        # Filter positives are confirmed against the database when it exists
+        from db import connect, get_db_path
+        from key_index import LoadedKeyFilter, drop_loaded
+        key_filter = LoadedKeyFilter.load()
+        conn = connect(read_only=True) if os.path.exists(get_db_path()) else None
     
-    print(f"\nSaving transformed data...")
-    with open(output_path, 'w', encoding='utf-8', newline='') as f:
-        df_transformed.to_csv(f, index=False)
+    # Transform each file on its own, so duplicates are only dropped within one
+    # extract (the same video trends in every region on the same day), and
+    # record a file in the ledger only once its output is saved
+    raw_records = 0
+    outputs = []
+    for input_path in input_paths:
+        # Read raw data, keeping the exact bytes so the ledger hashes what was parsed
+        print(f"\nReading {os.path.basename(input_path)}...")
+        content, buffer = read_snapshot(input_path)
+        df_raw = read_csv(buffer, RAW_SCHEMA)
+        raw_records += len(df_raw)
+        print(f"✓ Loaded {len(df_raw)} records")
+        
+        # Transform
+        print()
+        df_transformed = transform_data(df_raw, inplace=args.inplace, profile_memory=args.profile_memory,
+                                        engine=args.engine)
+        
+        # Divert rows that fail validation so only clean rows are saved
+        df_transformed, quarantined = validate_data(df_transformed)
+        if len(quarantined):
+            print(f"✓ Quarantined {len(quarantined)} invalid records: {write_quarantine(quarantined)}")
+        
+        if args.skip_loaded:
+            batch_size = len(df_transformed)
+            df_transformed = drop_loaded(df_transformed, key_filter, conn)
+            print(f"✓ Skipped {batch_size - len(df_transformed)} already loaded records")
+        
+        # Save transformed data, named after the extract it came from
+        output_filename = 'youtube_transformed_' + os.path.basename(input_path).removeprefix('youtube_raw_')
+        output_path = os.path.join(transformed_dir, output_filename)
+        
+        print(f"\nSaving transformed data...")
+        with open(output_path, 'w', encoding='utf-8', newline='') as f:
+            df_transformed.to_csv(f, index=False)
+        
+        print(f"✓ Saved to: {output_path}")
+        print(f"✓ File size: {os.path.getsize(output_path)} bytes")
+        
+        ledger.record(input_path, content, output=output_filename)
+        ledger.save()
+        outputs.append(df_transformed)
     
-    print(f"✓ Saved to: {output_path}")
-    print(f"✓ File size: {os.path.getsize(output_path)} bytes")
+    if conn is not None:
+        conn.close()
+    df_transformed = outputs[0] if len(outputs) == 1 else pd.concat(outputs, ignore_index=True)
     
     # Summary
     print("\n" + "=" * 60)
     print("TRANSFORMATION SUMMARY")
     print("=" * 60)
-    print(f"Original records:    {len(df_raw)}")
+    print(f"Original records:    {raw_records}")
     print(f"Transformed records: {len(df_transformed)}")
     print(f"New columns added:   duration_minutes, engagement_rate, like_rate, comment_rate, days_to_trend")
     
@@ -0,0 +1,133 @@
+import pandas as pd
+
+from profiling import MemoryProfiler
+from schema import TRANSFORMED_SCHEMA, apply_schema
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+# Same character class as clean_text: Python's Unicode \w is [\p{L}\p{N}_]
+CLEAN_TEXT_PATTERN = r'[^\p{L}\p{N}_\s,.\-!?]'
+DURATION_PATTERN = r'^PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?$'
+MICROSECONDS_PER_DAY = 86_400_000_000
+
+def _require_polars():
+    if pl is None:
+        raise ImportError("❌ The polars engine needs polars installed: pip install polars")
+
+def _clean_text(column):
+    """Polars version of transform.clean_text"""
+    return (
+        pl.col(column)
+        .str.replace_all(CLEAN_TEXT_PATTERN, '')
+        .str.strip_chars()
+        .fill_null('')
+    )
+
+def _duration_minutes():
+    """Polars version of transform.parse_duration (0 for anything unparseable)"""
+    duration = pl.col('duration')
+    parts = [
+        duration.str.extract(DURATION_PATTERN, group).cast(pl.Int64).fill_null(0)
+        for group in (1, 2, 3)
+    ]
+    minutes = parts[0] * 60 + parts[1] + parts[2] / 60
+    matched = duration.str.contains(DURATION_PATTERN).fill_null(False)
+    return pl.when(matched).then(minutes.round(2)).otherwise(0.0)
+
+def _rate(*numerators):
+    """Count(s) per view in percent, with 0/0 mapped to 0 like the pandas path"""
+    total = sum(pl.col(c).cast(pl.Float64) for c in numerators)
+    return (total / pl.col('view_count').cast(pl.Float64) * 100).round(4).fill_nan(0)
+
+def _to_utc(column):
+    """Parse a date/timestamp string column to UTC like pd.to_datetime(utc=True)"""
+    return pl.col(column).str.to_datetime(time_unit='us', time_zone='UTC', strict=False)
+
+def transform_lazy(lf):
+    """Build the lazy transform plan on a LazyFrame of raw rows"""
+    _require_polars()
+    # Categoricals come back as plain strings; the pandas schema is reapplied at the end
+    schema = lf.collect_schema()
+    categoricals = [name for name, dtype in schema.items() if dtype in (pl.Categorical, pl.Enum)]
+    if categoricals:
+        lf = lf.with_columns(pl.col(categoricals).cast(pl.String))
+
+    return (
+        lf
+        .with_columns(
+            _clean_text('title').alias('title'),
+            _clean_text('channel_name').alias('channel_name'),
+            pl.col('like_count').fill_null(0),
+            pl.col('comment_count').fill_null(0),
+            pl.col('tags').fill_null('')
+        )
+        .with_columns(
+            _duration_minutes().alias('duration_minutes'),
+            pl.when(pl.col('view_count') == 0)
+            .then(0.0)
+            .otherwise(_rate('like_count', 'comment_count'))
+            .alias('engagement_rate'),
+            _rate('like_count').alias('like_rate'),
+            _rate('comment_count').alias('comment_rate'),
+            _to_utc('published_at').alias('published_at'),
+            _to_utc('trending_date').alias('trending_date')
+        )
+        .with_columns(
+            # Floor to whole days like pandas' Timedelta.days
+            ((pl.col('trending_date') - pl.col('published_at')).dt.total_microseconds()
+             .floordiv(MICROSECONDS_PER_DAY))
+            .alias('days_to_trend')
+        )
+        .unique(subset=['video_id', 'trending_date'], keep='first', maintain_order=True)
+    )
+
+def transform_data_polars(df, profile_memory=False, columns=None):
+    """Run transform_data on the polars lazy engine and return a pandas frame
+
+    With columns, the plan ends in a select so projection pushdown drops the
+    expressions the requested columns do not need.
+    """
+    _require_polars()
+    profiler = MemoryProfiler(enabled=profile_memory)
+
+    print("Applying transformations (polars engine)...")
+    original_count = len(df)
+    with profiler.step('to_polars'):
+        lf = pl.from_pandas(df).lazy()
+    with profiler.step('collect'):
+        lf = transform_lazy(lf)
+        if columns is not None:
+            lf = lf.select(list(columns))
+        result = lf.collect()
+    print(f"  Removed {original_count - result.height} duplicate records")
+
+    with profiler.step('to_pandas'):
+        df_clean = apply_schema(result.to_pandas(), TRANSFORMED_SCHEMA)
+
+    if profile_memory:
+        profiler.stop()
+        print("- Peak memory per step:")
+        profiler.report()
+        df_clean.attrs['memory_profile'] = profiler.steps
+
+    return df_clean
+
+def assert_engines_match(expected, actual):
+    """Raise AssertionError unless both engines produced the same frame column for column"""
+    expected = expected.reset_index(drop=True)
+    actual = actual.reset_index(drop=True)
+    assert list(expected.columns) == list(actual.columns), \
+        f"Column mismatch: {list(expected.columns)} != {list(actual.columns)}"
+    for column in expected.columns:
+        left, right = expected[column], actual[column]
+        if pd.api.types.is_datetime64_any_dtype(left.dtype):
+            # Datetime resolution depends on the pandas version; compare instants
+            left, right = left.dt.as_unit('us'), right.dt.as_unit('us')
+        elif isinstance(left.dtype, pd.CategoricalDtype):
+            # Category sets may keep values that dedup removed; compare the values
+            assert isinstance(right.dtype, pd.CategoricalDtype), f"column '{column}' is not categorical"
+            left, right = left.astype(object), right.astype(object)
+        pd.testing.assert_series_equal(left, right, check_exact=True, obj=f"column '{column}'")
@@ -0,0 +1,70 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(script_dir)
+
+QUARANTINE_DIR = os.path.join(project_dir, 'data', 'quarantine')
+
+# ISO 8601 durations as returned by the API (P0D for live streams); no
+# lookarounds so the pattern also runs on pyarrow's RE2 engine
+_TIME_PART = r'T(?:\d+H(?:\d+M)?(?:\d+S)?|\d+M(?:\d+S)?|\d+S)'
+DURATION_PATTERN = rf'P(?:\d+D(?:{_TIME_PART})?|{_TIME_PART})'
+
+def _per_category(series, check):
+    """Evaluate check once per distinct value of a categorical, elementwise otherwise"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        valid = pd.Series(check(series.cat.categories.to_series()).to_numpy())
+        codes = series.cat.codes.to_numpy()
+        return pd.Series(valid.to_numpy()[codes] & (codes >= 0), index=series.index)
+    return check(series).fillna(False).astype(bool)
+
+def _is_blank(series):
+    return series.isna() | (series.astype(str).str.strip() == '')
+
+def validation_masks(df):
+    """Return a boolean frame with one column per rule, True where a row fails the rule"""
+    masks = {
+        'empty_video_id': _is_blank(df['video_id']),
+        'negative_counts': (df[['view_count', 'like_count', 'comment_count']] < 0).any(axis=1),
+        'malformed_duration': ~_per_category(
+            df['duration'], lambda s: s.astype(str).str.fullmatch(DURATION_PATTERN)),
+        'bad_published_at': df['published_at'].isna(),
+        'bad_trending_date': df['trending_date'].isna(),
+        'bad_extracted_at': ~_per_category(
+            df['extracted_at'], lambda s: pd.to_datetime(s, errors='coerce').notna())
+    }
+    return pd.DataFrame(masks, index=df.index)
+
+def validate_data(df):
+    """Split df into (clean rows, quarantined rows with a 'reasons' column)"""
+    masks = validation_masks(df)
+    failed = masks.any(axis=1).to_numpy()
+    if not failed.any():
+        return df, df.iloc[0:0].assign(reasons=pd.Series(dtype=object))
+
+    # Join the names of the failed rules, e.g. "negative_counts;malformed_duration"
+    rule_names = pd.Series([f'{name};' for name in masks.columns], index=masks.columns, dtype=object)
+    reasons = masks[failed].astype(object).dot(rule_names).str.rstrip(';')
+    quarantined = df[failed].assign(reasons=reasons.to_numpy())
+    return df[~failed], quarantined
+
+def write_quarantine(quarantined, path=None):
+    """Append quarantined rows to a JSONL file; returns the path
+
+    Each call appends, so rows quarantined by earlier runs are kept.
+    """
+    if quarantined.empty:
+        return None
+    if path is not None and not path.endswith('.jsonl'):
+        raise ValueError(f"Quarantine files are appended as JSON lines, expected a .jsonl path: {path}")
+    if path is None:
+        os.makedirs(QUARANTINE_DIR, exist_ok=True)
+        path = os.path.join(QUARANTINE_DIR, f'quarantine_{datetime.now().strftime("%Y%m%d_%H%M%S")}.jsonl')
+
+    quarantined = quarantined.assign(quarantined_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    with open(path, 'a', encoding='utf-8') as f:
+        quarantined.to_json(f, orient='records', lines=True, date_format='iso', force_ascii=False)
+    return path
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+from transform import to_utc
+
+SNAPSHOT_KEY = ['video_id', 'region_code']
+COUNT_COLUMNS = ['view_count', 'like_count', 'comment_count']
+
+VELOCITY_COLUMNS = [
+    'hours_since_prev', 'view_delta', 'like_delta', 'comment_delta',
+    'view_velocity', 'like_velocity', 'comment_velocity'
+]
+
+# Makes the previous-snapshot lookup a single index seek per (video_id, region_code)
+SNAPSHOT_INDEX = '''CREATE INDEX IF NOT EXISTS idx_trending_snapshot
+    ON trending_data (video_id, region_code, extracted_at)'''
+
+def _timestamps(series):
+    """Parse extracted_at strings to naive UTC datetime64 values"""
+    return to_utc(series.astype(str)).dt.tz_localize(None).to_numpy(dtype='datetime64[us]')
+
+def fetch_previous_snapshots(df, conn):
+    """Return the latest stored snapshot before the batch for each (video_id, region_code) in df
+
+    Only reads (a TEMP table aside), so conn may be read-only; the
+    SNAPSHOT_INDEX it relies on is created by migration 2. conn=None, for a
+    database not created yet, returns no snapshots.
+    """
+    if conn is None:
+        return pd.DataFrame(columns=SNAPSHOT_KEY + ['extracted_at'] + COUNT_COLUMNS)
+    cursor = conn.cursor()
+    cursor.execute('''CREATE TEMP TABLE IF NOT EXISTS batch_snapshot_keys (
+        video_id TEXT NOT NULL,
+        region_code TEXT NOT NULL,
+        extracted_at TEXT NOT NULL,
+        PRIMARY KEY (video_id, region_code)
+    )''')
+    cursor.execute("DELETE FROM temp.batch_snapshot_keys")
+
+    keys = (
+        df[SNAPSHOT_KEY + ['extracted_at']].astype(str)
+        .groupby(SNAPSHOT_KEY, sort=False)['extracted_at'].min()
+        .reset_index()
+    )
+    cursor.executemany("INSERT INTO temp.batch_snapshot_keys VALUES (?, ?, ?)",
+                       keys.itertuples(index=False, name=None))
+
+    rows = cursor.execute('''
+        SELECT t.video_id, t.region_code, t.extracted_at, t.view_count, t.like_count, t.comment_count
+        FROM temp.batch_snapshot_keys b
+        JOIN trending_data t ON t.id = (
+            SELECT p.id FROM trending_data p
+            WHERE p.video_id = b.video_id
+              AND p.region_code = b.region_code
+              AND p.extracted_at < b.extracted_at
+            ORDER BY p.extracted_at DESC
+            LIMIT 1
+        )
+    ''').fetchall()
+    return pd.DataFrame(rows, columns=SNAPSHOT_KEY + ['extracted_at'] + COUNT_COLUMNS)
+
+def add_velocity(df, conn):
+    """Add per-snapshot deltas and per-hour velocities against the previous snapshot
+
+    The previous snapshot of a row is the preceding row for the same
+    (video_id, region_code) in df, or for the first one the latest snapshot
+    already stored in trending_data. Rows without a previous snapshot get nulls.
+    """
+    previous = fetch_previous_snapshots(df, conn)
+
+    snapshots = pd.DataFrame({
+        'video_id': df['video_id'].astype(str).to_numpy(),
+        'region_code': df['region_code'].astype(str).to_numpy(),
+        'extracted_at': _timestamps(df['extracted_at']),
+        'row': np.arange(len(df))
+    })
+    for column in COUNT_COLUMNS:
+        snapshots[column] = df[column].to_numpy(dtype='int64')
+
+    stored = previous.assign(extracted_at=_timestamps(previous['extracted_at']), row=-1)
+    for column in COUNT_COLUMNS:
+        stored[column] = stored[column].astype('int64')
+
+    # Stored snapshots sort before the batch, so shift(1) finds each row's predecessor
+    combined = pd.concat([stored, snapshots], ignore_index=True)
+    combined = combined.sort_values(SNAPSHOT_KEY + ['extracted_at'], kind='stable')
+    prior = combined.groupby(SNAPSHOT_KEY, sort=False)[['extracted_at'] + COUNT_COLUMNS].shift(1)
+    current = combined['row'].to_numpy() >= 0
+    order = combined['row'].to_numpy()[current]
+
+    hours = (combined['extracted_at'] - prior['extracted_at']).dt.total_seconds().to_numpy()[current] / 3600
+    result = {'hours_since_prev': np.empty(len(df))}
+    result['hours_since_prev'][order] = hours
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per_hour = np.where(hours > 0, hours, np.nan)
+        for column in COUNT_COLUMNS:
+            name = column.replace('_count', '')
+            delta = (combined[column] - prior[column]).to_numpy()[current]
+            result[f'{name}_delta'] = np.empty(len(df))
+            result[f'{name}_delta'][order] = delta
+            result[f'{name}_velocity'] = np.empty(len(df))
+            result[f'{name}_velocity'][order] = delta / per_hour
+
+    for column in VELOCITY_COLUMNS:
+        values = result[column]
+        df[column] = pd.array(values, dtype='Int64') if column.endswith('_delta') else values
+    return df
@@ -0,0 +1,90 @@
+import hashlib
+
+# Columns whose change opens a new version of a video
+HASHED_COLUMNS = [
+    'title', 'channel_id', 'channel_name', 'category_id',
+    'published_at', 'duration_minutes', 'tags'
+]
+
+# videos keeps the current version of each video for joins; videos_history
+# keeps every version (type 2 slowly changing dimension), the current one
+# with valid_to NULL. valid_from is the extracted_at the version was seen at.
+VIDEO_HISTORY_TABLES = [
+    '''CREATE TABLE IF NOT EXISTS videos_history (
+        video_id TEXT NOT NULL,
+        valid_from TEXT NOT NULL,
+        valid_to TEXT,
+        title TEXT NOT NULL,
+        channel_id TEXT NOT NULL,
+        channel_name TEXT NOT NULL,
+        category_id INTEGER,
+        published_at TEXT NOT NULL,
+        duration_minutes REAL,
+        tags TEXT,
+        content_hash TEXT NOT NULL
+    )''',
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_videos_history_version ON videos_history (video_id, valid_from)',
+    '''CREATE INDEX IF NOT EXISTS idx_videos_history_valid_to
+        ON videos_history (valid_to) WHERE valid_to IS NOT NULL'''
+]
+
+# A staged video s differs from its stored version v, and was not seen before it
+CHANGED = 'v.content_hash IS NOT s.content_hash AND (v.valid_from IS NULL OR s.valid_from >= v.valid_from)'
+
+def content_hash(*values):
+    """Return the SHA-1 of the HASHED_COLUMNS values of one video, as stored in SQLite"""
+    text = '\x1f'.join('' if value is None else str(value) for value in values)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def register_content_hash(conn):
+    """Make content_hash callable from SQL as video_hash(<HASHED_COLUMNS>)"""
+    conn.create_function('video_hash', len(HASHED_COLUMNS), content_hash, deterministic=True)
+
+def hash_staged(conn, staging):
+    """Fill content_hash of every staged video
+
+    Hashing the staged values in SQL means a version hashes the same
+    whether it comes from a batch or, during migration, from videos.
+    """
+    register_content_hash(conn)
+    conn.execute(f"UPDATE temp.{staging} SET content_hash = video_hash({', '.join(HASHED_COLUMNS)})")
+
+def stage_changes(conn, staging):
+    """Copy the new and changed staged videos into TEMP video_changes; returns (new, changed, unchanged)
+
+    This is the batch's only comparison with videos; the history and videos
+    writes then read just video_changes, which is empty for a batch with no
+    edits.
+    """
+    conn.execute("DROP TABLE IF EXISTS temp.video_changes")
+    conn.execute(f'''
+        CREATE TEMP TABLE video_changes AS
+        SELECT s.*, v.video_id IS NULL AS is_new
+        FROM temp.{staging} s LEFT JOIN videos v ON v.video_id = s.video_id
+        WHERE v.video_id IS NULL OR ({CHANGED})
+    ''')
+    conn.execute("CREATE UNIQUE INDEX temp.video_changes_key ON video_changes (video_id)")
+    new, written = conn.execute("SELECT COALESCE(SUM(is_new), 0), COUNT(*) FROM temp.video_changes").fetchone()
+    staged = conn.execute(f"SELECT COUNT(*) FROM temp.{staging}").fetchone()[0]
+    return new, written - new, staged - written
+
+def write_history(conn):
+    """Close the open version of every video in video_changes and open its new version
+
+    New videos get their first version. Each step is one statement for the
+    whole batch; run it before videos is updated. The caller commits.
+    """
+    conn.execute('''
+        UPDATE videos_history
+        SET valid_to = (SELECT c.valid_from FROM temp.video_changes c WHERE c.video_id = videos_history.video_id)
+        WHERE valid_to IS NULL AND video_id IN (SELECT video_id FROM temp.video_changes WHERE NOT is_new)
+    ''')
+    columns = ['video_id', 'valid_from'] + HASHED_COLUMNS + ['content_hash']
+    updates = ', '.join(f'{column} = excluded.{column}' for column in HASHED_COLUMNS + ['content_hash'])
+    # A changed version seen at the same extracted_at replaces the one it closed
+    conn.execute(f'''
+        INSERT INTO videos_history ({', '.join(columns)})
+        SELECT {', '.join(columns)} FROM temp.video_changes WHERE true
+        ORDER BY video_id
+        ON CONFLICT (video_id, valid_from) DO UPDATE SET {updates}, valid_to = NULL
+    ''')
@@ -0,0 +1,154 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from db import connect
+from load_sqlite import write_batch
+from migrations import migrate
+from key_index import snapshot_keys
+
+QUEUE_SIZE = int(os.getenv('WRITER_QUEUE_SIZE', 8))  # batches waiting before submit() blocks
+GROUP_ROWS = int(os.getenv('WRITER_GROUP_ROWS', 50_000))  # rows committed together at most
+GROUP_WAIT = float(os.getenv('WRITER_GROUP_WAIT', 0.5))  # seconds a group waits for more batches
+
+_STOP = object()
+
+class SQLiteWriter:
+    """The only writer of the database: producers submit batches, one thread loads them
+
+    Batches are taken from a bounded queue and group-committed: the writer
+    keeps taking batches until GROUP_ROWS rows or GROUP_WAIT seconds, loads
+    each in its own savepoint and commits the group once. submit() returns
+    a Future that resolves to the batch's write_batch counts after its
+    commit, or to the error that rolled back only that batch. Producers
+    never open a write connection, so they never wait on the write lock.
+    key_filter is used only on the writer thread, which adds the keys of
+    each committed batch to it.
+    """
+
+    def __init__(self, db_path=None, key_filter=None, queue_size=None, group_rows=None, group_wait=None):
+        self.db_path = db_path
+        self.key_filter = key_filter
+        self.group_rows = group_rows or GROUP_ROWS
+        self.group_wait = GROUP_WAIT if group_wait is None else group_wait
+        self.commits = 0
+        self._saturation_logged = False
+        self._queue = queue.Queue(maxsize=queue_size or QUEUE_SIZE)
+        self._ready = Future()
+        self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._thread.start()
+        # Surface a failed connect or migration here rather than on the first submit
+        self._ready.result()
+
+    def submit(self, df):
+        """Queue df for loading; returns a Future of its counts. Blocks while the queue is full"""
+        if not self._thread.is_alive():
+            raise RuntimeError("SQLite writer is closed")
+        future = Future()
+        self._queue.put((df, future))
+        return future
+
+    def close(self):
+        """Load the queued batches, then stop the writer and close its connection"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _next_group(self):
+        """Block for one batch, then take more until group_rows or group_wait; returns (group, stop)"""
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+        group, rows = [item], len(item[0])
+        deadline = time.monotonic() + self.group_wait
+        while rows < self.group_rows:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return group, True
+            group.append(item)
+            rows += len(item[0])
+        return group, False
+
+    def _write_group(self, conn, group):
+        """Load every batch of group in its own savepoint and commit them together"""
+        done = []
+        conn.execute("BEGIN")
+        for df, future in group:
+            if not future.set_running_or_notify_cancel():
+                continue
+            conn.execute("SAVEPOINT batch")
+            try:
+                counts = write_batch(df, conn, self.key_filter)
+            except Exception as e:
+                conn.execute("ROLLBACK TO batch")
+                conn.execute("RELEASE batch")
+                logging.error(f"Writer rolled back a batch of {len(df)} rows: {e}")
+                future.set_exception(e)
+                continue
+            conn.execute("RELEASE batch")
+            done.append((df, future, counts))
+        try:
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            for _, future, _ in done:
+                future.set_exception(e)
+            return
+        self.commits += 1
+        for _, future, counts in done:
+            future.set_result(counts)
+        if self.key_filter is not None and done:
+            # Only the writer adds keys, so the filter holds just committed snapshots
+            try:
+                for df, _, _ in done:
+                    self.key_filter.add(snapshot_keys(df))
+                self.key_filter.save()
+            except Exception as e:
+                logging.warning(f"Could not update the loaded key filter: {e}")
+            if self.key_filter.saturated and not self._saturation_logged:
+                logging.warning("Loaded key filter is over capacity; run key_index.py --rebuild")
+                self._saturation_logged = True
+
+    def _run(self):
+        conn = None
+        try:
+            conn = connect(self.db_path)
+            for version in migrate(conn):
+                logging.info(f"Applied schema migration {version}")
+        except Exception as e:
+            if conn is not None:
+                conn.close()
+            self._ready.set_exception(e)
+            return
+        self._ready.set_result(True)
+        try:
+            stop = False
+            while not stop:
+                group, stop = self._next_group()
+                if not group:
+                    continue
+                try:
+                    self._write_group(conn, group)
+                except Exception as e:
+                    # The group could not be written at all; fail whatever it has not resolved
+                    conn.rollback()
+                    logging.error(f"Writer failed a group of {len(group)} batches: {e}")
+                    for _, future in group:
+                        if not future.done():
+                            future.set_exception(e)
+            # Refresh planner statistics so the dashboard keeps using QUERY_INDEXES
+            conn.execute("PRAGMA optimize")
+        finally:
+            conn.close()
@@ -1,6 +1,6 @@
 -- YouTube Analytics - Key Analysis Queries
 
--- 1. Top 10 Most Viewed Videos
+-- 1. Top 10 Most Viewed Videos (top rows read from idx_trending_views before the join)
 SELECT 
     v.title,
     v.channel_name,
@@ -8,10 +8,14 @@ SELECT
     t.like_count,
     t.engagement_rate,
     t.trending_date
-FROM videos v
-JOIN trending_data t ON v.video_id = t.video_id
-ORDER BY t.view_count DESC
-LIMIT 10;
+FROM (
+    SELECT video_id, view_count, like_count, engagement_rate, trending_date
+    FROM trending_data
+    ORDER BY view_count DESC
+    LIMIT 10
+) t
+JOIN videos v ON v.video_id = t.video_id
+ORDER BY t.view_count DESC;
 
 -- 2. Category Performance Analysis
 SELECT 
@@ -91,4 +95,176 @@ SELECT
     AVG(engagement_rate) as avg_engagement
 FROM trending_data
 GROUP BY DATE(trending_date)
-ORDER BY date DESC;
\ No newline at end of file
+ORDER BY date DESC;
+
+-- 8. Top Tags (integer join through video_tags)
+SELECT 
+    tg.tag,
+    COUNT(*) as video_count
+FROM video_tags vt
+JOIN tags tg ON tg.tag_id = vt.tag_id
+GROUP BY vt.tag_id
+ORDER BY video_count DESC
+LIMIT 20;
+
+-- 9. Trending Performance of Videos with a Given Tag
+SELECT 
+    v.title,
+    t.view_count,
+    t.engagement_rate
+FROM tags tg
+JOIN video_tags vt ON vt.tag_id = tg.tag_id
+JOIN videos v ON v.video_id = vt.video_id
+JOIN trending_data t ON t.video_id = v.video_id
+WHERE tg.tag = 'netflix'
+ORDER BY t.view_count DESC;
+
+-- 10. Biggest Chart Climbers in the Latest Snapshot (primary key range on chart_ranks)
+SELECT 
+    r.chart_rank,
+    r.prev_rank,
+    r.rank_delta,
+    v.title
+FROM chart_ranks r
+JOIN videos v ON v.video_id = r.video_id
+WHERE r.region_code = 'US'
+  AND r.snapshot_at = (SELECT MAX(snapshot_at) FROM chart_ranks WHERE region_code = 'US')
+ORDER BY r.rank_delta DESC
+LIMIT 10;
+
+-- 11. Biggest Single-Snapshot Climbs Ever (idx_chart_ranks_delta)
+SELECT 
+    r.video_id,
+    r.region_code,
+    r.snapshot_at,
+    r.prev_rank,
+    r.chart_rank,
+    r.rank_delta
+FROM chart_ranks r
+ORDER BY r.rank_delta DESC
+LIMIT 10;
+
+-- 12. Longest at #1 (idx_chart_ranks_rank)
+SELECT 
+    r.video_id,
+    r.region_code,
+    COUNT(*) as snapshots_at_number_one
+FROM chart_ranks r
+WHERE r.chart_rank = 1
+GROUP BY r.video_id, r.region_code
+ORDER BY snapshots_at_number_one DESC
+LIMIT 10;
+
+-- 13. Top Videos Counting Reuploads Once (minhash_signatures clusters)
+SELECT 
+    COALESCE(s.cluster_id, v.video_id) as cluster,
+    COUNT(DISTINCT v.video_id) as uploads,
+    MAX(v.title) as example_title,
+    SUM(t.view_count) as total_views
+FROM trending_data t
+JOIN videos v ON v.video_id = t.video_id
+LEFT JOIN minhash_signatures s ON s.video_id = v.video_id
+WHERE t.trending_date = (SELECT MAX(trending_date) FROM trending_data)
+GROUP BY cluster
+ORDER BY total_views DESC
+LIMIT 10;
+
+-- 14. Global Hits: Videos Trending in 5+ Regions on the Same Day (idx_region_presence_day)
+SELECT 
+    p.video_id,
+    v.title,
+    p.trending_date,
+    p.region_count
+FROM video_region_presence p
+JOIN videos v ON v.video_id = p.video_id
+WHERE p.trending_date = (SELECT MAX(trending_date) FROM video_region_presence)
+  AND p.region_count >= 5
+ORDER BY p.region_count DESC
+LIMIT 10;
+
+-- 15. Videos Trending in Both US and GB (bitwise test on the multi-region rows only)
+SELECT 
+    p.video_id,
+    p.trending_date
+FROM video_region_presence p
+WHERE p.region_count >= 2
+  AND p.region_mask & (SELECT SUM(1 << bit) FROM regions WHERE region_code IN ('US', 'GB'))
+      = (SELECT SUM(1 << bit) FROM regions WHERE region_code IN ('US', 'GB'))
+ORDER BY p.trending_date DESC
+LIMIT 20;
+
+-- 16. Region Overlap: Jaccard Similarity of the Video-Days Trending in Each Region Pair
+SELECT 
+    a.region_code as region_a,
+    b.region_code as region_b,
+    SUM((p.region_mask >> a.bit) & (p.region_mask >> b.bit) & 1) * 1.0 /
+        SUM(((p.region_mask >> a.bit) | (p.region_mask >> b.bit)) & 1) as jaccard
+FROM regions a
+JOIN regions b ON a.bit < b.bit
+CROSS JOIN video_region_presence p
+GROUP BY a.region_code, b.region_code
+ORDER BY jaccard DESC;
+
+-- 17. Longest Trending Streaks (idx_streaks_days)
+SELECT 
+    s.video_id,
+    v.title,
+    s.region_code,
+    s.streak_start,
+    s.last_seen,
+    s.days
+FROM trending_streaks s
+JOIN videos v ON v.video_id = s.video_id
+ORDER BY s.days DESC
+LIMIT 10;
+
+-- 18. Currently Trending in US and for How Many Days in a Row (idx_streaks_last_seen)
+SELECT 
+    s.video_id,
+    s.streak_start,
+    s.days
+FROM trending_streaks s
+WHERE s.region_code = 'US'
+  AND s.last_seen = (SELECT MAX(last_seen) FROM trending_streaks WHERE region_code = 'US')
+ORDER BY s.days DESC;
+
+-- 19. Latest View Growth Anomalies (idx_anomalies_detected)
+SELECT 
+    a.detected_at,
+    a.video_id,
+    v.title,
+    a.kind,
+    ROUND(a.views_per_hour, 0) as views_per_hour,
+    ROUND(a.expected_per_hour, 0) as expected_per_hour,
+    ROUND(a.z_score, 1) as z_score
+FROM anomalies a
+JOIN videos v ON v.video_id = a.video_id
+ORDER BY a.detected_at DESC
+LIMIT 20;
+
+-- 20. Videos Retitled While Trending (videos_history versions, idx_videos_history_valid_to)
+SELECT 
+    h.video_id,
+    h.title as previous_title,
+    v.title as current_title,
+    h.valid_to as retitled_at
+FROM videos_history h
+JOIN videos v ON v.video_id = h.video_id
+WHERE h.valid_to IS NOT NULL
+  AND h.title != v.title
+ORDER BY h.valid_to DESC
+LIMIT 20;
+
+-- 21. Days at #1 Including Snapshots Past Retention (trending_daily rollups and idx_chart_ranks_rank)
+SELECT 
+    d.video_id,
+    d.region_code,
+    COUNT(*) as days_at_number_one
+FROM (
+    SELECT video_id, region_code, trending_date FROM trending_daily WHERE peak_rank = 1
+    UNION
+    SELECT video_id, region_code, substr(snapshot_at, 1, 10) FROM chart_ranks WHERE chart_rank = 1
+) d
+GROUP BY d.video_id, d.region_code
+ORDER BY days_at_number_one DESC
+LIMIT 10;
\ No newline at end of file
@@ -3,6 +3,8 @@ CREATE DATABASE IF NOT EXISTS youtube_analytics;
 USE youtube_analytics;
 
 -- Drop existing tables if they exist (for clean restart)
+DROP TABLE IF EXISTS video_tags;
+DROP TABLE IF EXISTS tags;
 DROP TABLE IF EXISTS trending_data;
 DROP TABLE IF EXISTS videos;
 DROP TABLE IF EXISTS categories;
@@ -62,9 +64,34 @@ CREATE TABLE trending_data (
     comment_rate DECIMAL(10,4),
     days_to_trend INT,
     extracted_at TIMESTAMP NOT NULL,
+    hours_since_prev DOUBLE,
+    view_delta BIGINT,
+    like_delta INT,
+    comment_delta INT,
+    view_velocity DOUBLE,
+    like_velocity DOUBLE,
+    comment_velocity DOUBLE,
     FOREIGN KEY (video_id) REFERENCES videos(video_id) ON DELETE CASCADE,
     UNIQUE KEY unique_trending (video_id, trending_date, region_code),
+    INDEX idx_snapshot (video_id, region_code, extracted_at),
     INDEX idx_trending_date (trending_date),
     INDEX idx_region (region_code),
     INDEX idx_views (view_count)
+);
+
+-- Tag dictionary (one row per distinct, lower-cased tag)
+CREATE TABLE tags (
+    tag_id INT AUTO_INCREMENT PRIMARY KEY,
+    tag VARCHAR(255) COLLATE utf8mb4_bin NOT NULL,
+    UNIQUE KEY unique_tag (tag)
+);
+
+-- Video to tag bridge (replaces LIKE scans over videos.tags)
+CREATE TABLE video_tags (
+    video_id VARCHAR(20) NOT NULL,
+    tag_id INT NOT NULL,
+    PRIMARY KEY (video_id, tag_id),
+    FOREIGN KEY (video_id) REFERENCES videos(video_id) ON DELETE CASCADE,
+    FOREIGN KEY (tag_id) REFERENCES tags(tag_id),
+    INDEX idx_tag (tag_id, video_id)
 );
\ No newline at end of file
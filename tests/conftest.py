@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Make the pipeline modules and the synthetic data helpers importable
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_dir, 'scripts'))
+sys.path.insert(0, os.path.join(project_dir, 'benchmarks'))
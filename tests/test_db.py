@@ -0,0 +1,16 @@
+import pytest
+
+from db import connect
+
+@pytest.mark.parametrize('directory', ['a#b', 'a?b', 'a%20b', 'a b'])
+def test_read_only_connect_opens_the_named_file(tmp_path, directory):
+    db_path = tmp_path / directory / 'x.db'
+    db_path.parent.mkdir()
+    conn = connect(str(db_path))
+    conn.execute("CREATE TABLE videos (video_id TEXT)")
+    conn.commit()
+    conn.close()
+
+    conn = connect(str(db_path), read_only=True)
+    assert conn.execute("SELECT COUNT(*) FROM videos").fetchone() == (0,)
+    conn.close()
@@ -0,0 +1,38 @@
+import pytest
+
+from check_query_plans import analysis_queries, build_database, dashboard_queries, plan_regressions
+
+from db import connect
+from shards import archive_month
+
+QUERIES = dashboard_queries() + analysis_queries()
+
+@pytest.fixture(scope='module', params=['unsharded', 'sharded'])
+def conn(request, tmp_path_factory):
+    """A read-only connection to a small seeded and analyzed database, as the dashboard opens it
+
+    The sharded database has half of its snapshots moved a month back and
+    archived, leaving main and its statistics as they are after a monthly
+    archive run.
+    """
+    db_path = str(tmp_path_factory.mktemp('plans') / 'plans.db')
+    build_database(db_path, rows=20_000, snapshots_per_video=20)
+    if request.param == 'sharded':
+        writer = connect(db_path)
+        writer.execute('''
+            UPDATE trending_data SET trending_date = replace(trending_date, '2025-12-', '2025-11-'),
+                                     extracted_at = replace(extracted_at, '2025-12-', '2025-11-')
+            WHERE id % 2 = 0
+        ''')
+        writer.commit()
+        archive_month(writer, '2025-11')
+        writer.execute("ANALYZE")
+        writer.close()
+    conn = connect(db_path, read_only=True)
+    yield conn
+    conn.close()
+
+@pytest.mark.parametrize('name, sql', QUERIES, ids=[name for name, _ in QUERIES])
+def test_no_unindexed_scan_of_large_tables(conn, name, sql):
+    regressions, plan = plan_regressions(conn, name, sql)
+    assert not regressions, f"{name} scans {regressions}:\n" + '\n'.join(plan)
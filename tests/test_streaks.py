@@ -0,0 +1,31 @@
+import contextlib
+import io
+
+import pandas as pd
+
+from db import connect
+from load_sqlite import create_database
+from shards import archive_month, archived_months, months_to_archive
+from streaks import rebuild
+
+def test_rebuild_reads_more_shards_than_can_be_attached(tmp_path):
+    db_path = str(tmp_path / 'streaks.db')
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_database(db_path).close()
+    conn = connect(db_path)
+    # One streak across thirteen months, broken by a single missing day
+    days = [day for day in pd.date_range('2024-12-20', '2025-12-10').strftime('%Y-%m-%d') if day != '2025-06-15']
+    conn.executemany('''
+        INSERT INTO trending_data (video_id, trending_date, region_code, view_count, like_count,
+                                   comment_count, extracted_at)
+        VALUES ('v1', ?, 'US', 1, 0, 0, ?)
+    ''', [(f'{day} 00:00:00+00:00', f'{day} 06:00:00+00:00') for day in days])
+    conn.commit()
+    for month in months_to_archive(conn):
+        archive_month(conn, month)
+    assert len(archived_months(conn)) == 13
+
+    assert rebuild(conn) == (2, len(days))
+    streaks = conn.execute("SELECT streak_start, last_seen, days FROM trending_streaks ORDER BY streak_start").fetchall()
+    assert streaks == [('2024-12-20', '2025-06-14', 177), ('2025-06-16', '2025-12-10', 178)]
+    conn.close()
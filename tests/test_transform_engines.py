@@ -0,0 +1,23 @@
+import pytest
+
+from synthetic import make_raw_frame
+
+from transform import transform_data
+
+pytest.importorskip('polars')
+from transform_polars import assert_engines_match
+
+@pytest.fixture
+def raw():
+    """A few hundred rows with repeated videos, so dedup has work to do, and some missing counts"""
+    df = make_raw_frame(400, seed=7, unique_videos=150)
+    df.loc[df.index[::17], 'like_count'] = None
+    df.loc[df.index[::23], 'tags'] = None
+    return df
+
+def test_engines_match(raw):
+    assert_engines_match(transform_data(raw), transform_data(raw, engine='polars'))
+
+def test_engines_match_for_selected_columns(raw):
+    columns = ['video_id', 'trending_date', 'engagement_rate', 'days_to_trend']
+    assert_engines_match(transform_data(raw, columns=columns), transform_data(raw, engine='polars', columns=columns))